@@ -5,4 +5,4 @@ __version__ = "0.6.4"
 
 # Database schema version (integer, increment only when DB schema/migration logic changes).
 # This is stored in the DB to support safe upgrades.
-__db_schema_version__ = 3
+__db_schema_version__ = 9
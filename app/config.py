@@ -40,6 +40,13 @@ class Settings(BaseSettings):
     # Default 30 days.
     session_ttl_days: int = 30
 
+    # Max number of worker threads for sync (def) endpoints. AnyIO's default is 40; blocking calls
+    # to bank/LLM/OCR providers can hold threads for seconds, so allow more in parallel. 0 = keep default.
+    api_threadpool_size: int = 100
+    # SQLAlchemy connection pool (per process). Keep pool_size + max_overflow >= api_threadpool_size.
+    db_pool_size: int = 20
+    db_max_overflow: int = 90
+
     data_dir: str = "data"
     uploads_dir: str = "data/uploads"
     preprocessed_dir: str = "data/preprocessed"
@@ -10,7 +10,14 @@ from app import __db_schema_version__
 
 Path(settings.data_dir).mkdir(parents=True, exist_ok=True)
 
-engine = create_engine(f"sqlite:///{settings.sqlite_path}", future=True)
+# Pool groot genoeg voor de API-threadpool (api_threadpool_size) + achtergrondthreads; anders wachten
+# requests op een vrije connectie (QueuePool default: 5 + 10 overflow).
+engine = create_engine(
+    f"sqlite:///{settings.sqlite_path}",
+    future=True,
+    pool_size=max(1, int(settings.db_pool_size)),
+    max_overflow=max(0, int(settings.db_max_overflow)),
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
@@ -110,11 +117,85 @@ def _apply_pending_migrations(conn) -> None:
         if not _column_exists(c, "documents", "preprocessed_content_type"):
             c.execute(text("ALTER TABLE documents ADD COLUMN preprocessed_content_type VARCHAR(128)"))
 
+    def _migration_v4(c) -> None:
+        # Normalized label name for index-friendly, case-insensitive lookups.
+        if not _column_exists(c, "labels", "normalized_name"):
+            c.execute(text("ALTER TABLE labels ADD COLUMN normalized_name VARCHAR(120)"))
+        # Backfill in Python: SQLite lower() only folds ASCII, the app uses str.lower().
+        rows = c.execute(text("SELECT id, name FROM labels")).mappings().all()
+        for r in rows:
+            c.execute(
+                text("UPDATE labels SET normalized_name = :n WHERE id = :id"),
+                {"n": str(r["name"] or "").strip().lower(), "id": r["id"]},
+            )
+        c.execute(text("CREATE INDEX IF NOT EXISTS ix_labels_tenant_norm ON labels(tenant_id, group_id, normalized_name)"))
+
+    def _migration_v5(c) -> None:
+        # Expression index for the case-insensitive e-mail lookups (signup, wachtwoord vergeten/reset).
+        c.execute(text("CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users(lower(email))"))
+
+    def _migration_v6(c) -> None:
+        # Normalized category name (zelfde aanpak als labels.normalized_name) + indexen voor de naam-lookups.
+        if not _column_exists(c, "category_catalog", "normalized_name"):
+            c.execute(text("ALTER TABLE category_catalog ADD COLUMN normalized_name VARCHAR(120)"))
+        rows = c.execute(text("SELECT id, name FROM category_catalog")).mappings().all()
+        for r in rows:
+            c.execute(
+                text("UPDATE category_catalog SET normalized_name = :n WHERE id = :id"),
+                {"n": str(r["name"] or "").strip().lower(), "id": r["id"]},
+            )
+        c.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_category_catalog_tenant_norm ON category_catalog(tenant_id, normalized_name)")
+        )
+        c.execute(text("CREATE INDEX IF NOT EXISTS ix_labels_tenant_normname ON labels(tenant_id, normalized_name)"))
+
+    def _migration_v7(c) -> None:
+        # Expression indexes for the remaining func.lower(...) lookups (categorie hernoemen/verwijderen, tenant slug).
+        c.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_documents_tenant_lower_category ON documents(tenant_id, lower(category))")
+        )
+        c.execute(text("CREATE INDEX IF NOT EXISTS ix_tenants_slug_lower ON tenants(lower(slug))"))
+
+    def _migration_v8(c) -> None:
+        # Composite indexes matching the ORDER BY of the bank account/transaction listings (geen sort na scan).
+        c.execute(text("CREATE INDEX IF NOT EXISTS ix_bank_accounts_tenant_created ON bank_accounts(tenant_id, created_at DESC)"))
+        c.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS ix_bank_transactions_tenant_account_booking
+                ON bank_transactions(tenant_id, bank_account_id, booking_date DESC, created_at DESC)
+                """
+            )
+        )
+
+    def _migration_v9(c) -> None:
+        # Budget-analyse: rijen per run in ORDER BY-volgorde en "laatste run per tenant" zonder sort.
+        c.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS ix_bank_budget_analysis_txs_tenant_run_booking
+                ON bank_budget_analysis_txs(tenant_id, run_id, booking_date, created_at)
+                """
+            )
+        )
+        c.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_bank_budget_analysis_runs_tenant_created "
+                "ON bank_budget_analysis_runs(tenant_id, created_at DESC)"
+            )
+        )
+
     # Future-proof: add explicit migration steps here.
     MIGRATIONS: dict[int, callable] = {
         # 1: baseline (introduced schema_migrations table)
         2: _migration_v2,
         3: _migration_v3,
+        4: _migration_v4,
+        5: _migration_v5,
+        6: _migration_v6,
+        7: _migration_v7,
+        8: _migration_v8,
+        9: _migration_v9,
     }
 
     for v in range(current + 1, target + 1):
@@ -1029,14 +1110,14 @@ def rebuild_search_index_for_all_documents() -> None:
 
     db = SessionLocal()
     try:
-        docs = db.query(Document).filter(Document.deleted_at.is_(None)).all()
+        # Enkel id + searchable_text nodig; geen volledige Document-objecten (en labels) laden.
+        rows = db.query(Document.id, Document.searchable_text).filter(Document.deleted_at.is_(None)).all()
         with engine.begin() as conn:
             conn.execute(text("DELETE FROM document_search"))
-            for d in docs:
-                content = d.searchable_text or ""
+            if rows:
                 conn.execute(
                     text("INSERT INTO document_search(document_id, content) VALUES (:id, :content)"),
-                    {"id": d.id, "content": content},
+                    [{"id": r.id, "content": r.searchable_text or ""} for r in rows],
                 )
     finally:
         db.close()
@@ -1,6 +1,8 @@
 import uuid
+import time
 from datetime import datetime, timedelta
 from difflib import get_close_matches
+from functools import lru_cache
 import json
 import hashlib
 import traceback
@@ -9,18 +11,23 @@ import smtplib
 import ssl
 import secrets
 from pathlib import Path
+from json.encoder import encode_basestring as _json_str
 import ipaddress
 import re
 from threading import Lock, Thread, Event
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote
 from email.message import EmailMessage
 
-from fastapi import Depends, FastAPI, File, HTTPException, Query, UploadFile, Header, Request
+import anyio.to_thread
+from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, Query, UploadFile, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import text, func, or_, and_
-from sqlalchemy.orm import Session
+from sqlalchemy import text, func, or_, and_, case, insert, update, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, load_only, selectinload
 
 from app.config import settings
 from app.db import (
@@ -49,6 +56,10 @@ from app.models import (
     AsyncJob,
     Tenant,
     User,
+    document_labels,
+    normalize_category_name,
+    normalize_label_name,
+    user_groups,
 )
 from app.schemas import (
     AuthOut,
@@ -109,13 +120,33 @@ from app.services.bank_aggregator import BankAggregatorClient
 from app.services.bank_import import parse_imported_transactions
 from app.services.mail_ingest import ingest_mail_pdfs
 from app.services.pipeline import process_document
-from app.services.audit import audit_log
+from app.services.audit import audit_log, audit_log_insert
 
 app = FastAPI(title=settings.app_name)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 log = logging.getLogger("docstore")
 
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+NON_DIGIT_RE = re.compile(r"[^0-9]+")
+ISSUER_SPLIT_RE = re.compile(r"[^a-zA-Z0-9]+")
+ISSUER_TOKEN_BLACKLIST = frozenset(
+    {
+        "vzw",
+        "bvba",
+        "bvb",
+        "nv",
+        "cv",
+        "az",
+        "the",
+        "shop",
+        "store",
+        "gent",
+        "brugge",
+        "belgie",
+        "belgium",
+    }
+)
 BUDGET_ANALYZE_PROGRESS: dict[str, dict] = {}
 BUDGET_ANALYZE_LOCK = Lock()
 MAIL_INGEST_RUN_LOCK = Lock()
@@ -125,6 +156,29 @@ MAIL_INGEST_THREAD: Thread | None = None
 DOCUMENT_JOB_STOP_EVENT = Event()
 DOCUMENT_JOB_THREAD: Thread | None = None
 GROUPS_ENABLED = False
+BANK_TX_UPDATE_BATCH_SIZE = 5000
+PURGE_BATCH_SIZE = 500
+PURGE_UNLINK_WORKERS = 8
+BANK_SYNC_WORKERS = 8
+BANK_CHECK_LLM_WORKERS = 4
+DOC_LINK_DAY_BATCH_SIZE = 500
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
+AVATAR_UPLOAD_CHUNK_SIZE = 64 * 1024
+DOCUMENT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+BANK_IMPORT_MAX_BYTES = 50 * 1024 * 1024
+BANK_IMPORT_CHUNK_SIZE = 1024 * 1024
+EMPTY_BUDGET_TX_HASH = hashlib.sha256(b"[]").hexdigest()
+HASH_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+DEDUPE_HASH_TEMPLATE = (
+    '{"amount": %s, "booking_date": %s, "counterparty_name": %s, "currency": %s, '
+    '"remittance_information": %s, "value_date": %s}'
+)
+TENANT_NAME_CACHE_TTL_SECONDS = 30
+TENANT_NAME_CACHE: dict[str, tuple[float, str]] = {}
+TENANT_NAME_CACHE_LOCK = Lock()
+# Tenants waarvoor de bankcategorie-labels in dit proces al gesynchroniseerd zijn.
+BANK_LABELS_ENSURED: set[str] = set()
+BANK_LABELS_ENSURED_LOCK = Lock()
 
 
 def _slugify_tenant(value: str) -> str:
@@ -137,7 +191,7 @@ def _ensure_unique_tenant_slug(db: Session, value: str) -> str:
     base = _slugify_tenant(value)
     candidate = base
     seq = 2
-    while db.query(Tenant).filter(func.lower(Tenant.slug) == candidate.lower()).first():
+    while db.query(db.query(Tenant.id).filter(func.lower(Tenant.slug) == candidate.lower()).exists()).scalar():
         suffix = f"-{seq}"
         candidate = f"{base[: max(1, 64 - len(suffix))]}{suffix}"
         seq += 1
@@ -758,35 +812,88 @@ def _tenant_id_for_user(user: User) -> str:
 
 
 def _tenant_name_for_id(db: Session, tenant_id: str) -> str:
-    row = db.query(Tenant).filter(Tenant.id == str(tenant_id or "").strip()).first()
-    return str(getattr(row, "name", "") or "")
+    tid = str(tenant_id or "").strip()
+    now = time.monotonic()
+    with TENANT_NAME_CACHE_LOCK:
+        cached = TENANT_NAME_CACHE.get(tid)
+    if cached and cached[0] > now:
+        return cached[1]
+    name = db.query(Tenant.name).filter(Tenant.id == tid).scalar()
+    if name is None:
+        return ""
+    with TENANT_NAME_CACHE_LOCK:
+        TENANT_NAME_CACHE[tid] = (now + TENANT_NAME_CACHE_TTL_SECONDS, str(name or ""))
+    return str(name or "")
+
+
+def _invalidate_tenant_name_cache(tenant_id: str) -> None:
+    with TENANT_NAME_CACHE_LOCK:
+        TENANT_NAME_CACHE.pop(str(tenant_id or "").strip(), None)
 
 
 def _tenant_stats(db: Session, tenant_id: str) -> dict[str, int]:
-    users_count = db.query(func.count(User.id)).filter(User.tenant_id == tenant_id).scalar() or 0
-    admins_count = (
-        db.query(func.count(func.distinct(User.id)))
+    return _tenant_stats_bulk(db, [tenant_id]).get(tenant_id) or _empty_tenant_stats()
+
+
+def _empty_tenant_stats() -> dict[str, int]:
+    return {
+        "users_count": 0,
+        "admins_count": 0,
+        "groups_count": 0,
+        "documents_count": 0,
+        "transactions_count": 0,
+    }
+
+
+def _tenant_stats_bulk(db: Session, tenant_ids: list[str]) -> dict[str, dict[str, int]]:
+    # Eén GROUP BY-query per telling voor alle tenants samen i.p.v. vijf queries per tenant.
+    ids = sorted({str(tid or "").strip() for tid in tenant_ids if str(tid or "").strip()})
+    out = {tid: _empty_tenant_stats() for tid in ids}
+    if not ids:
+        return out
+
+    def _fill(key: str, rows) -> None:
+        for tid, count in rows:
+            if str(tid or "") in out:
+                out[str(tid)][key] = int(count or 0)
+
+    _fill(
+        "users_count",
+        db.query(User.tenant_id, func.count(User.id)).filter(User.tenant_id.in_(ids)).group_by(User.tenant_id).all(),
+    )
+    _fill(
+        "admins_count",
+        db.query(User.tenant_id, func.count(func.distinct(User.id)))
         .outerjoin(User.groups)
-        .filter(User.tenant_id == tenant_id)
+        .filter(User.tenant_id.in_(ids))
         .filter(
             or_(
                 User.is_bootstrap_admin.is_(True),
-                and_(Group.tenant_id == tenant_id, func.lower(Group.name).like("administrators%")),
+                and_(Group.tenant_id == User.tenant_id, func.lower(Group.name).like("administrators%")),
             )
         )
-        .scalar()
-        or 0
+        .group_by(User.tenant_id)
+        .all(),
     )
-    documents_count = db.query(func.count(Document.id)).filter(Document.tenant_id == tenant_id).scalar() or 0
-    transactions_count = db.query(func.count(BankTransaction.id)).filter(BankTransaction.tenant_id == tenant_id).scalar() or 0
-    groups_count = db.query(func.count(Group.id)).filter(Group.tenant_id == tenant_id).scalar() or 0
-    return {
-        "users_count": int(users_count),
-        "admins_count": int(admins_count),
-        "groups_count": int(groups_count),
-        "documents_count": int(documents_count),
-        "transactions_count": int(transactions_count),
-    }
+    _fill(
+        "documents_count",
+        db.query(Document.tenant_id, func.count(Document.id))
+        .filter(Document.tenant_id.in_(ids))
+        .group_by(Document.tenant_id)
+        .all(),
+    )
+    _fill(
+        "transactions_count",
+        db.query(BankTransaction.tenant_id, func.count(BankTransaction.id))
+        .filter(BankTransaction.tenant_id.in_(ids))
+        .group_by(BankTransaction.tenant_id)
+        .all(),
+    )
+    _fill(
+        "groups_count",
+        db.query(Group.tenant_id, func.count(Group.id)).filter(Group.tenant_id.in_(ids)).group_by(Group.tenant_id).all(),
+    )
+    return out
 
 
 def _find_tenant_admin_group(db: Session, tenant_id: str) -> Group | None:
@@ -881,37 +988,25 @@ def _current_session_token(db: Session, authorization: str | None) -> SessionTok
 
 def _category_to_out(row: CategoryCatalog | None, name: str) -> dict:
     default = _default_category_profile(name)
-    parse_fields: list[str] = []
-    if row and row.parse_fields_json:
-        try:
-            loaded = json.loads(row.parse_fields_json)
-            if isinstance(loaded, list):
-                parse_fields = [str(x) for x in loaded]
-        except Exception:
-            parse_fields = []
+    parse_fields: list[str] = [str(x) for x in row.parse_fields_list()] if row else []
     if not parse_fields:
         parse_fields = default["parse_fields"]
     parse_config: list[dict] = []
-    if row and row.parse_config_json:
-        try:
-            loaded = json.loads(row.parse_config_json)
-            if isinstance(loaded, list):
-                seen = set()
-                for item in loaded:
-                    if not isinstance(item, dict):
-                        continue
-                    key = str(item.get("key", "")).strip().lower().replace(" ", "_")
-                    if not key or key in seen:
-                        continue
-                    seen.add(key)
-                    parse_config.append(
-                        {
-                            "key": key,
-                            "visible_in_overview": bool(item.get("visible_in_overview", True)),
-                        }
-                    )
-        except Exception:
-            parse_config = []
+    if row:
+        seen = set()
+        for item in row.parse_config_list():
+            if not isinstance(item, dict):
+                continue
+            key = str(item.get("key", "")).strip().lower().replace(" ", "_")
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            parse_config.append(
+                {
+                    "key": key,
+                    "visible_in_overview": bool(item.get("visible_in_overview", True)),
+                }
+            )
     if not parse_config:
         parse_config = [{"key": k, "visible_in_overview": True} for k in parse_fields]
     parse_fields = [c["key"] for c in parse_config]
@@ -1056,12 +1151,20 @@ def document_to_out(doc: Document) -> dict:
     }
 
 
+def _s(value: object) -> str:
+    # Equivalent van str(value or "").strip(), zonder extra str() voor gewone strings.
+    if not value:
+        return ""
+    return value.strip() if isinstance(value, str) else str(value).strip()
+
+
 def bank_account_to_out(row: BankAccount) -> dict:
+    provider = row.provider or "vdk"
     return {
         "id": row.id,
         "tenant_id": row.tenant_id,
         "name": row.name,
-        "provider": (row.provider or "vdk").strip().lower(),
+        "provider": provider.strip().lower(),
         "iban": row.iban,
         "external_account_id": row.external_account_id,
         "is_active": bool(row.is_active),
@@ -1095,16 +1198,16 @@ def bank_transaction_to_out(row: BankTransaction) -> dict:
 
 
 def bank_csv_import_to_out(row: BankCsvImport, meta: dict | None = None) -> dict:
-    meta = meta or {}
+    get = (meta or {}).get
     return {
         "id": row.id,
         "tenant_id": row.tenant_id,
         "filename": row.filename,
         "imported_count": int(row.imported_count or 0),
-        "account_number": (str(meta.get("account_number") or "").strip() or None),
-        "account_name": (str(meta.get("account_name") or "").strip() or None),
-        "filter_date_from": (str(meta.get("filter_date_from") or "").strip() or None),
-        "filter_date_to": (str(meta.get("filter_date_to") or "").strip() or None),
+        "account_number": _s(get("account_number")) or None,
+        "account_name": _s(get("account_name")) or None,
+        "filter_date_from": _s(get("filter_date_from")) or None,
+        "filter_date_to": _s(get("filter_date_to")) or None,
         "parsed_at": row.parsed_at,
         "parsed_source_hash": row.parsed_source_hash,
         "created_at": row.created_at,
@@ -1148,30 +1251,52 @@ def _ensure_bank_category_labels(db: Session, tenant_id: str) -> None:
         db.commit()
 
 
-def _ensure_doc_has_label(db: Session, doc: Document, label_name: str) -> None:
+def _ensure_bank_category_labels_once(db: Session, tenant_id: str) -> None:
+    # Mappingcategorieën wijzigen zelden: enkel synchroniseren bij de eerste aanvraag na een wijziging.
+    with BANK_LABELS_ENSURED_LOCK:
+        if tenant_id in BANK_LABELS_ENSURED:
+            return
+    _ensure_bank_category_labels(db, tenant_id)
+    with BANK_LABELS_ENSURED_LOCK:
+        BANK_LABELS_ENSURED.add(tenant_id)
+
+
+def _invalidate_bank_category_labels(tenant_id: str) -> None:
+    with BANK_LABELS_ENSURED_LOCK:
+        BANK_LABELS_ENSURED.discard(tenant_id)
+
+
+def _ensure_doc_has_label(db: Session, doc: Document, label_name: str, label_cache: dict | None = None) -> None:
+    # label_cache: optioneel dict per aanroepende lus; elke categorie wordt dan één keer opgezocht (of aangemaakt)
+    # i.p.v. een groep- en labelquery per document.
     if not label_name:
         return
     label_name = str(label_name or "").strip()
     if not label_name:
         return
-    grp = _ensure_tenant_user_group(db, doc.tenant_id)
-    if not grp.id:
-        db.flush()
-    group_id = grp.id
-    label = (
-        db.query(Label)
-        .filter(
-            Label.tenant_id == doc.tenant_id,
-            Label.group_id == group_id,
-            func.lower(func.trim(Label.name)) == label_name.lower(),
+    cache_key = (doc.tenant_id, normalize_label_name(label_name))
+    label = label_cache.get(cache_key) if label_cache is not None else None
+    if label is None:
+        grp = _ensure_tenant_user_group(db, doc.tenant_id)
+        if not grp.id:
+            db.flush()
+        group_id = grp.id
+        label = (
+            db.query(Label)
+            .filter(
+                Label.tenant_id == doc.tenant_id,
+                Label.group_id == group_id,
+                Label.normalized_name == cache_key[1],
+            )
+            .first()
         )
-        .first()
-    )
-    if not label:
-        label = Label(tenant_id=doc.tenant_id, name=label_name.strip(), group_id=group_id)
-        db.add(label)
-        db.commit()
-        db.refresh(label)
+        if not label:
+            label = Label(tenant_id=doc.tenant_id, name=label_name.strip(), group_id=group_id)
+            db.add(label)
+            db.commit()
+            db.refresh(label)
+        if label_cache is not None:
+            label_cache[cache_key] = label
     if label not in (doc.labels or []):
         doc.labels.append(label)
 
@@ -1202,7 +1327,7 @@ def _ensure_doc_single_label(db: Session, doc: Document) -> bool:
         .filter(
             Label.tenant_id == doc.tenant_id,
             Label.group_id == group_id,
-            func.lower(func.trim(Label.name)) == target.lower(),
+            Label.normalized_name == normalize_label_name(target),
         )
         .first()
     )
@@ -1308,6 +1433,35 @@ def _split_external_account_id(composite_id: str) -> tuple[str, str]:
     return "vdk", value
 
 
+async def _read_bank_import_upload(file: UploadFile) -> tuple[bytes, str]:
+    # In blokken lezen en meteen hashen; te grote bestanden stoppen zodra de limiet overschreden is.
+    # De blokken worden niet bijgehouden: UploadFile staat al gespoold (SpooledTemporaryFile), dus na de hashpass
+    # één keer terugspoelen en volledig lezen geeft de inhoud met maar één kopie in het geheugen.
+    hasher = hashlib.sha256()
+    size = 0
+    while chunk := await file.read(BANK_IMPORT_CHUNK_SIZE):
+        size += len(chunk)
+        if size > BANK_IMPORT_MAX_BYTES:
+            raise HTTPException(
+                status_code=400, detail=f"Bestand is te groot (max {BANK_IMPORT_MAX_BYTES // (1024 * 1024)}MB)"
+            )
+        hasher.update(chunk)
+    if not size:
+        raise HTTPException(status_code=400, detail="Bestand is leeg")
+    await file.seek(0)
+    return await file.read(), hasher.hexdigest()
+
+
+def _bank_client_for_provider(runtime: dict, provider: str) -> BankAggregatorClient:
+    return BankAggregatorClient(
+        provider=provider,
+        base_url=str(runtime.get(f"{provider}_base_url") or runtime.get("bank_base_url") or ""),
+        client_id=str(runtime.get(f"{provider}_client_id") or runtime.get("bank_client_id") or ""),
+        api_key=str(runtime.get(f"{provider}_api_key") or runtime.get("bank_api_key") or ""),
+        password=str(runtime.get(f"{provider}_password") or runtime.get("bank_password") or ""),
+    )
+
+
 def _get_or_create_csv_import_account(db: Session, tenant_id: str) -> BankAccount:
     existing = (
         db.query(BankAccount)
@@ -1336,17 +1490,30 @@ def _tx_raw_payload(tx: dict) -> dict:
         return raw
     if not raw:
         return {}
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
     try:
-        parsed = json.loads(str(raw))
+        # json.loads accepteert str en (utf-8) bytes rechtstreeks.
+        parsed = json.loads(raw if isinstance(raw, (str, bytes, bytearray)) else str(raw))
     except Exception:
         return {}
     return parsed if isinstance(parsed, dict) else {}
 
 
 def _tx_movement_type(tx: dict) -> str:
-    direct = str(tx.get("movement_type") or "").strip()
+    direct = tx.get("movement_type")
+    if isinstance(direct, str):
+        # Al opgelost door bank_transaction_to_out; "" betekent dat raw_json geen soort beweging heeft,
+        # dus niet per pass opnieuw parsen.
+        return direct.strip()
     if direct:
-        return direct
+        return str(direct).strip()
+    raw_json = tx.get("raw_json")
+    # Zonder csv_fields valt er niets te vinden: parsen overslaan.
+    if isinstance(raw_json, str) and "csv_fields" not in raw_json:
+        return ""
+    if isinstance(raw_json, (bytes, bytearray)) and b"csv_fields" not in raw_json:
+        return ""
     raw = _tx_raw_payload(tx)
     csv_fields = raw.get("csv_fields")
     if isinstance(csv_fields, dict):
@@ -1357,41 +1524,60 @@ def _tx_movement_type(tx: dict) -> str:
     return ""
 
 
-def _mapping_category_for_tx(tx: dict, mappings: list[dict[str, str]], flow: str) -> str | None:
-    movement_type = _tx_movement_type(tx)
-    desc = f"{tx.get('counterparty_name') or ''} {tx.get('remittance_information') or ''} {movement_type}".lower()
-    desc_norm = re.sub(r"[^a-z0-9]+", "", desc)
-    candidates = []
-    relaxed_candidates = []
+BudgetMappingRules = tuple[tuple[str, str, str, str], ...]
+
+
+def _compile_budget_mappings(mappings: list[dict[str, str]]) -> BudgetMappingRules:
+    # Eenmalig per request normaliseren i.p.v. per transactie; langste keyword eerst (stabiele sort,
+    # dus bij gelijke lengte wint de eerste mapping, zoals voorheen).
+    rules: list[tuple[int, str, str, str, str]] = []
     for mapping in mappings:
         keyword = str(mapping.get("keyword") or "").strip().lower()
-        keyword_norm = re.sub(r"[^a-z0-9]+", "", keyword)
-        mflow = str(mapping.get("flow") or "all").strip().lower()
         cat = str(mapping.get("category") or "").strip()
         if not keyword or not cat:
             continue
-        match = keyword in desc or (keyword_norm and keyword_norm in desc_norm)
-        if not match:
+        keyword_norm = NON_ALNUM_RE.sub("", keyword)
+        mflow = str(mapping.get("flow") or "all").strip().lower()
+        rules.append((len(keyword_norm or keyword), keyword, keyword_norm, mflow, cat))
+    rules.sort(key=lambda x: x[0], reverse=True)
+    return tuple(rule[1:] for rule in rules)
+
+
+def _mapping_category_for_tx(
+    tx: dict,
+    mappings: list[dict[str, str]] | BudgetMappingRules,
+    flow: str,
+    movement_type: str | None = None,
+) -> str | None:
+    rules = mappings if isinstance(mappings, tuple) else _compile_budget_mappings(mappings)
+    if not rules:
+        return None
+    if movement_type is None:
+        movement_type = _tx_movement_type(tx)
+    desc = f"{tx.get('counterparty_name') or ''} {tx.get('remittance_information') or ''} {movement_type}".lower()
+    desc_norm = NON_ALNUM_RE.sub("", desc)
+    relaxed: str | None = None
+    for keyword, keyword_norm, mflow, cat in rules:
+        if not (keyword in desc or (keyword_norm and keyword_norm in desc_norm)):
             continue
         if mflow in {"all", flow}:
-            candidates.append((len(keyword_norm or keyword), cat))
-        else:
-            relaxed_candidates.append((len(keyword_norm or keyword), cat))
-    if candidates:
-        candidates.sort(key=lambda x: x[0], reverse=True)
-        return candidates[0][1]
-    if relaxed_candidates:
-        relaxed_candidates.sort(key=lambda x: x[0], reverse=True)
-        return relaxed_candidates[0][1]
-    return None
+            return cat
+        if relaxed is None:
+            relaxed = cat
+    return relaxed
 
 
-def _fallback_budget_category(tx: dict, mappings: list[dict[str, str]]) -> tuple[str, str, str]:
+def _fallback_budget_category(
+    tx: dict,
+    mappings: list[dict[str, str]] | BudgetMappingRules,
+    movement_type: str | None = None,
+) -> tuple[str, str, str]:
     amount = float(tx.get("amount") or 0)
     flow = "income" if amount >= 0 else "expense"
-    movement_type = _tx_movement_type(tx)
+    if movement_type is None:
+        movement_type = _tx_movement_type(tx)
     desc = f"{tx.get('counterparty_name') or ''} {tx.get('remittance_information') or ''} {movement_type}".lower()
-    mapped = _mapping_category_for_tx(tx, mappings, flow)
+    mapped = _mapping_category_for_tx(tx, mappings, flow, movement_type)
     if mapped:
         return flow, mapped, "mapping"
 
@@ -1414,11 +1600,24 @@ def _fallback_budget_category(tx: dict, mappings: list[dict[str, str]]) -> tuple
     return (flow, "Overige uitgaven", "rule")
 
 
+def _flow_totals(keys: list[str], flows: list[str], amounts: list[float]) -> tuple[dict[str, float], dict[str, float]]:
+    # Twee platte accumulators (income/expense) i.p.v. een dict per sleutel.
+    income = dict.fromkeys(keys, 0.0)
+    expense = dict.fromkeys(keys, 0.0)
+    for key, flow, amount in zip(keys, flows, amounts):
+        if flow == "income":
+            income[key] += amount
+        else:
+            expense[key] += amount
+    return income, expense
+
+
 def _build_budget_analysis_payload(
     transactions: list[dict],
     llm_data: dict,
     mappings: list[dict[str, str]],
     preferred_categories: list[str] | None = None,
+    period_totals: tuple[list[dict], list[dict]] | None = None,
 ) -> dict:
     category_rows: list[dict] = llm_data.get("transaction_categories") if isinstance(llm_data, dict) else []
     summary_points = llm_data.get("summary_points") if isinstance(llm_data, dict) else []
@@ -1439,19 +1638,22 @@ def _build_budget_analysis_payload(
 
     analyzed_transactions: list[dict] = []
     preferred_set = {str(c).strip().lower() for c in (preferred_categories or []) if str(c).strip()}
-    category_totals: dict[str, dict[str, float]] = {}
-    year_totals: dict[str, dict[str, float]] = {}
-    month_totals: dict[str, dict[str, float]] = {}
+    # Kolommen voor de totalen; aggregatie gebeurt in een aparte pass na de loop.
+    col_category: list[str] = []
+    col_booking: list[str] = []
+    col_flow: list[str] = []
+    col_abs: list[float] = []
+    mapping_rules = _compile_budget_mappings(mappings)
     for tx in transactions:
         ext_id = str(tx.get("external_transaction_id") or "").strip()
         amount = float(tx.get("amount") or 0)
         booking_date = str(tx.get("booking_date") or "")
-        year = booking_date[:4] if len(booking_date) >= 4 else "Onbekend"
-        month = booking_date[:7] if len(booking_date) >= 7 else "Onbekend"
 
         row = category_map.get(ext_id) or {}
         flow = "income" if amount >= 0 else "expense"
-        direct_mapping = _mapping_category_for_tx(tx, mappings, flow)
+        # raw_json slechts een keer parsen per transactie.
+        movement_type = _tx_movement_type(tx)
+        direct_mapping = _mapping_category_for_tx(tx, mapping_rules, flow, movement_type)
         category = str(row.get("category") or "").strip()
         reason = row.get("reason")
         source = str(row.get("source") or "llm").strip().lower() or "llm"
@@ -1470,7 +1672,7 @@ def _build_budget_analysis_payload(
             llm_mapping = True
         else:
             # Fallback blijft in "inschatting" kanaal zodat de rest altijd gecategoriseerd raakt.
-            _, category, _ = _fallback_budget_category(tx, mappings)
+            _, category, _ = _fallback_budget_category(tx, mapping_rules, movement_type)
             source = "llm"
             llm_mapping = True
             if not reason:
@@ -1485,7 +1687,7 @@ def _build_budget_analysis_payload(
                 "currency": tx.get("currency") or "EUR",
                 "counterparty_name": tx.get("counterparty_name"),
                 "remittance_information": tx.get("remittance_information"),
-                "movement_type": _tx_movement_type(tx),
+                "movement_type": movement_type,
                 "flow": flow,
                 "category": category,
                 "source": source,
@@ -1503,49 +1705,60 @@ def _build_budget_analysis_payload(
             }
         )
 
-        if category not in category_totals:
-            category_totals[category] = {"income": 0.0, "expense": 0.0}
-        if flow == "income":
-            category_totals[category]["income"] += abs_amount
-        else:
-            category_totals[category]["expense"] += abs_amount
-
-        if year not in year_totals:
-            year_totals[year] = {"income": 0.0, "expense": 0.0}
-        if month not in month_totals:
-            month_totals[month] = {"income": 0.0, "expense": 0.0}
-        if flow == "income":
-            year_totals[year]["income"] += abs_amount
-            month_totals[month]["income"] += abs_amount
-        else:
-            year_totals[year]["expense"] += abs_amount
-            month_totals[month]["expense"] += abs_amount
+        col_category.append(category)
+        col_booking.append(booking_date)
+        col_flow.append(flow)
+        col_abs.append(abs_amount)
 
-    sorted_categories = sorted(
-        category_totals.items(),
-        key=lambda x: (x[1]["income"] + x[1]["expense"]),
-        reverse=True,
-    )
-    sorted_years = sorted(year_totals.items(), key=lambda x: x[0])
-    sorted_months = sorted(month_totals.items(), key=lambda x: x[0])
+    cat_inc, cat_exp = _flow_totals(col_category, col_flow, col_abs)
+    sorted_categories = sorted(cat_inc, key=lambda k: cat_inc[k] + cat_exp[k], reverse=True)
+    if period_totals is not None:
+        # Jaar/maand totalen werden al in SQL berekend (zie _bank_period_totals).
+        year_totals, month_totals = period_totals
+    else:
+        years = [b[:4] if len(b) >= 4 else "Onbekend" for b in col_booking]
+        months = [b[:7] if len(b) >= 7 else "Onbekend" for b in col_booking]
+        year_inc, year_exp = _flow_totals(years, col_flow, col_abs)
+        month_inc, month_exp = _flow_totals(months, col_flow, col_abs)
+        year_totals = [
+            {"period": period, "income": year_inc[period], "expense": year_exp[period]}
+            for period in sorted(year_inc)
+        ]
+        month_totals = [
+            {"period": period, "income": month_inc[period], "expense": month_exp[period]}
+            for period in sorted(month_inc)
+        ]
     return {
         "summary_points": summary_points if isinstance(summary_points, list) else [],
         "transactions": analyzed_transactions,
         "category_totals": [
-            {"category": name, "income": vals["income"], "expense": vals["expense"]}
-            for name, vals in sorted_categories
-        ],
-        "year_totals": [
-            {"period": period, "income": vals["income"], "expense": vals["expense"]}
-            for period, vals in sorted_years
-        ],
-        "month_totals": [
-            {"period": period, "income": vals["income"], "expense": vals["expense"]}
-            for period, vals in sorted_months
+            {"category": name, "income": cat_inc[name], "expense": cat_exp[name]}
+            for name in sorted_categories
         ],
+        "year_totals": year_totals,
+        "month_totals": month_totals,
     }
 
 
+def _bank_period_totals(db: Session, tenant_id: str, bank_account_id: str) -> tuple[list[dict], list[dict]]:
+    amount = func.coalesce(BankTransaction.amount, 0.0)
+    income = func.sum(case((amount >= 0, amount), else_=0.0))
+    expense = func.sum(case((amount < 0, -amount), else_=0.0))
+    booking_date = func.coalesce(BankTransaction.booking_date, "")
+    out: list[list[dict]] = []
+    for size in (4, 7):
+        period = case((func.length(booking_date) >= size, func.substr(booking_date, 1, size)), else_="Onbekend").label("period")
+        rows = (
+            db.query(period, income, expense)
+            .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == bank_account_id)
+            .group_by(period)
+            .order_by(period.asc())
+            .all()
+        )
+        out.append([{"period": p, "income": float(inc or 0.0), "expense": float(exp or 0.0)} for p, inc, exp in rows])
+    return out[0], out[1]
+
+
 def _sync_budget_categories_to_mapping_settings(db: Session, tenant_id: str, analyzed_transactions: list[dict] | None) -> int:
     if not analyzed_transactions:
         return 0
@@ -1563,40 +1776,41 @@ def _sync_budget_categories_to_mapping_settings(db: Session, tenant_id: str, ana
     if not discovered:
         return 0
 
-    existing_rows = (
-        db.query(BankCategoryMapping)
-        .filter(BankCategoryMapping.tenant_id == tenant_id, BankCategoryMapping.is_active.is_(True))
+    # Een enkele kolom-query levert zowel de bestaande categorieën als de hoogste prioriteit.
+    existing_categories: set[str] = set()
+    max_priority = 0
+    for category, priority, is_active in (
+        db.query(BankCategoryMapping.category, BankCategoryMapping.priority, BankCategoryMapping.is_active)
+        .filter(BankCategoryMapping.tenant_id == tenant_id)
         .all()
-    )
-    existing_categories = {str(r.category or "").strip().lower() for r in existing_rows if str(r.category or "").strip()}
+    ):
+        if priority is not None and int(priority) > max_priority:
+            max_priority = int(priority)
+        if is_active and (key := _s(category).lower()):
+            existing_categories.add(key)
 
-    max_priority = (
-        db.query(func.max(BankCategoryMapping.priority))
-        .filter(BankCategoryMapping.tenant_id == tenant_id)
-        .scalar()
-        or 0
-    )
-    created = 0
+    new_rows: list[dict] = []
     for category, flows in discovered.items():
         key = category.lower()
         if key in existing_categories:
             continue
         inferred_flow = "all" if len(flows) > 1 else next(iter(flows))
         max_priority += 1
-        db.add(
-            BankCategoryMapping(
-                tenant_id=tenant_id,
-                keyword="",
-                flow=inferred_flow if inferred_flow in {"income", "expense", "all"} else "all",
-                category=category,
-                priority=int(max_priority),
-                is_active=True,
-            )
+        new_rows.append(
+            {
+                "tenant_id": tenant_id,
+                "keyword": "",
+                "flow": inferred_flow if inferred_flow in {"income", "expense", "all"} else "all",
+                "category": category,
+                "priority": int(max_priority),
+                "is_active": True,
+            }
         )
-        created += 1
-    if created:
+    if new_rows:
+        db.execute(insert(BankCategoryMapping), new_rows)
         db.commit()
-    return created
+        _invalidate_bank_category_labels(tenant_id)
+    return len(new_rows)
 
 
 def _persist_bank_tx_classification(
@@ -1617,35 +1831,83 @@ def _persist_bank_tx_classification(
     if not by_external_id:
         return 0
 
-    tx_rows = (
-        db.query(BankTransaction)
-        .filter(
-            BankTransaction.tenant_id == tenant_id,
-            BankTransaction.external_transaction_id.in_(list(by_external_id.keys())),
-        )
-        .all()
+    # Rechtstreekse executemany i.p.v. alle transacties als ORM-objecten te laden; rijen waarvan de
+    # classificatie niet wijzigt (bv. bij een gecachete run) worden niet opnieuw geschreven.
+    params = [
+        {
+            "tenant_id": tenant_id,
+            "ext_id": ext_id,
+            "category": str(payload.get("category") or "").strip() or None,
+            "source": str(payload.get("source") or "").strip() or None,
+            "auto_mapping": bool(payload.get("auto_mapping")),
+            "llm_mapping": bool(payload.get("llm_mapping")),
+            "manual_mapping": bool(payload.get("manual_mapping")),
+        }
+        for ext_id, payload in by_external_id.items()
+    ]
+    stmt = text(
+        """
+        UPDATE bank_transactions
+        SET category = :category,
+            source = :source,
+            auto_mapping = :auto_mapping,
+            llm_mapping = :llm_mapping,
+            manual_mapping = :manual_mapping
+        WHERE tenant_id = :tenant_id AND external_transaction_id = :ext_id
+          AND (
+            category IS NOT :category
+            OR source IS NOT :source
+            OR auto_mapping IS NOT :auto_mapping
+            OR llm_mapping IS NOT :llm_mapping
+            OR manual_mapping IS NOT :manual_mapping
+          )
+        """
     )
     updated = 0
-    for tx in tx_rows:
-        payload = by_external_id.get(str(tx.external_transaction_id or "").strip())
-        if not payload:
-            continue
-        tx.category = str(payload.get("category") or "").strip() or None
-        tx.source = str(payload.get("source") or "").strip() or None
-        tx.auto_mapping = bool(payload.get("auto_mapping"))
-        tx.llm_mapping = bool(payload.get("llm_mapping"))
-        tx.manual_mapping = bool(payload.get("manual_mapping"))
-        updated += 1
+    for start in range(0, len(params), BANK_TX_UPDATE_BATCH_SIZE):
+        result = db.execute(stmt, params[start : start + BANK_TX_UPDATE_BATCH_SIZE])
+        updated += max(int(result.rowcount or 0), 0)
     if updated:
         db.commit()
     return updated
 
 
 def _hash_json(value: object) -> str:
-    blob = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    blob = HASH_JSON_ENCODER.encode(value)
     return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
 
+def _hash_json_rows(rows) -> str:
+    # Zelfde digest als _hash_json(list(rows)), maar rij per rij in de hasher gestreamd zodat de
+    # volledige JSON-string van grote transactielijsten nooit in geheugen wordt opgebouwd.
+    h = hashlib.sha256(b"[")
+    for idx, row in enumerate(rows):
+        if idx:
+            h.update(b",")
+        h.update(HASH_JSON_ENCODER.encode(row).encode("utf-8"))
+    h.update(b"]")
+    return h.hexdigest()
+
+
+def _budget_tx_hash(tx_payload: list[dict]) -> str:
+    # Fingerprint van de analyse-input; een lege lijst heeft een vaste hash.
+    if not tx_payload:
+        return EMPTY_BUDGET_TX_HASH
+    return _hash_json_rows(
+        {
+            "external_transaction_id": t.get("external_transaction_id"),
+            "booking_date": t.get("booking_date"),
+            "amount": t.get("amount"),
+            "currency": t.get("currency"),
+            "counterparty_name": t.get("counterparty_name"),
+            "remittance_information": t.get("remittance_information"),
+            "movement_type": _tx_movement_type(t),
+            "linked_document_context": t.get("linked_document_context"),
+        }
+        for t in tx_payload
+    )
+
+
 def _preferred_budget_categories(mappings: list[dict[str, str]] | None) -> list[str]:
     out: list[str] = []
     seen: set[str] = set()
@@ -1662,35 +1924,35 @@ def _preferred_budget_categories(mappings: list[dict[str, str]] | None) -> list[
 
 
 def _normalize_text(value: str | None) -> str:
-    raw = re.sub(r"\s+", " ", str(value or "")).strip().lower()
-    return re.sub(r"[^a-z0-9]+", "", raw)
+    # Whitespace verdwijnt toch mee met de niet-alfanumerieke tekens.
+    return NON_ALNUM_RE.sub("", str(value or "").lower())
 
 
 def _digits_only(value: str | None) -> str:
-    return re.sub(r"[^0-9]+", "", str(value or ""))
-
-
-def _document_content_sha256(data: bytes) -> str:
-    return hashlib.sha256(data or b"").hexdigest()
+    return NON_DIGIT_RE.sub("", str(value or ""))
 
 
 def _tx_dedupe_hash_from_payload(payload: dict) -> str:
-    key = {
-        "booking_date": str(payload.get("booking_date") or "").strip(),
-        "value_date": str(payload.get("value_date") or "").strip(),
-        "amount": f"{float(payload.get('amount') or 0.0):.2f}",
-        "currency": str(payload.get("currency") or "EUR").strip().upper(),
-        "counterparty_name": _normalize_text(str(payload.get("counterparty_name") or "")),
-        "remittance_information": _normalize_text(str(payload.get("remittance_information") or "")),
-    }
-    return hashlib.sha256(json.dumps(key, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    # Byte-identiek aan json.dumps(key, ensure_ascii=False, sort_keys=True) van de vroegere dict (sleutels al
+    # gesorteerd), zodat bestaande dedupe_hash-waarden blijven matchen; zonder dict + sort per rij.
+    blob = DEDUPE_HASH_TEMPLATE % (
+        _json_str(f"{float(payload.get('amount') or 0.0):.2f}"),
+        _json_str(str(payload.get("booking_date") or "").strip()),
+        _json_str(_normalize_text(str(payload.get("counterparty_name") or ""))),
+        _json_str(str(payload.get("currency") or "EUR").strip().upper()),
+        _json_str(_normalize_text(str(payload.get("remittance_information") or ""))),
+        _json_str(str(payload.get("value_date") or "").strip()),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
 
 def _normalize_iban(value: str | None) -> str:
-    return re.sub(r"[^a-z0-9]+", "", str(value or "").upper())
+    return NON_ALNUM_RE.sub("", str(value or "").upper())
 
 
+@lru_cache(maxsize=4096)
 def _parse_iso_or_slash_date(value: str | None) -> datetime | None:
+    # Gecachet: de bankcheck parseert dezelfde document- en boekingsdatums voor elk kandidaatpaar.
     raw = str(value or "").strip()
     if not raw:
         return None
@@ -1709,29 +1971,11 @@ def _parse_iso_or_slash_date(value: str | None) -> datetime | None:
 
 
 def _issuer_token_candidates(value: str | None) -> list[str]:
-    raw_tokens = [t.strip() for t in re.split(r"[^a-zA-Z0-9]+", str(value or "")) if t and len(t.strip()) >= 4]
-    blacklist = {
-        "vzw",
-        "bvba",
-        "bvb",
-        "nv",
-        "cv",
-        "az",
-        "the",
-        "shop",
-        "store",
-        "gent",
-        "brugge",
-        "belgie",
-        "belgium",
-    }
     out: list[str] = []
     seen: set[str] = set()
-    for token in raw_tokens:
+    for token in ISSUER_SPLIT_RE.split(str(value or "")):
         t = token.lower()
-        if t in blacklist or len(t) < 4:
-            continue
-        if t in seen:
+        if len(t) < 4 or t in ISSUER_TOKEN_BLACKLIST or t in seen:
             continue
         seen.add(t)
         out.append(t)
@@ -1755,55 +1999,67 @@ def _tx_match_score(doc: Document, tx: BankTransaction) -> tuple[int, str, str]:
     if tx_date and due_date and tx_date > (due_date + timedelta(days=365)):
         return (-1, "none", "Transactiedatum onrealistisch laat t.o.v. due date")
 
+    # Fallback rule requested: amount + IBAN is enough when tx date is within 3 months
+    # of the document date (not upload/create date).
+    doc_anchor = doc_date
+    within_three_months = False
+    if tx_date and doc_anchor:
+        try:
+            within_three_months = abs((tx_date.date() - doc_anchor.date()).days) <= 93
+        except Exception:
+            within_three_months = False
+
     rem = str(tx.remittance_information or "")
     cp = str(tx.counterparty_name or "")
     raw = str(tx.raw_json or "")
     joined = f"{cp} {rem} {raw}".strip()
-    joined_norm = _normalize_text(joined)
-    joined_digits = _digits_only(joined)
 
-    ref_digits = _digits_only(doc.structured_reference)
-    ref_norm = _normalize_text(doc.structured_reference)
     iban_norm = _normalize_iban(doc.iban)
-    joined_iban_norm = _normalize_iban(joined)
-    iban_match = bool(iban_norm) and (iban_norm in joined_iban_norm)
+    iban_match = bool(iban_norm) and (iban_norm in _normalize_iban(joined))
+    # Zonder IBAN-match en buiten 3 maanden kan geen enkele regel nog slagen.
+    if not iban_match and not within_three_months:
+        return (-1, "none", "Geen voldoende IBAN/mededeling/naam-match")
 
+    # Genormaliseerde tekst is de duurste stap: enkel berekenen wanneer een check ze nodig heeft.
+    joined_norm: str | None = None
+
+    def _joined_norm() -> str:
+        nonlocal joined_norm
+        if joined_norm is None:
+            joined_norm = _normalize_text(joined)
+        return joined_norm
+
+    ref_digits = _digits_only(doc.structured_reference)
     memo_match = False
-    if ref_digits and ref_digits in joined_digits:
-        memo_match = True
-    elif ref_norm and ref_norm in joined_norm:
-        memo_match = True
-
-    # Secondary "mededeling" hints if structured reference is missing/weak.
-    if not memo_match:
-        subject_tokens = [t for t in re.split(r"[^a-z0-9]+", str(doc.subject or "").lower()) if len(t) >= 6]
-        issuer_tokens = [t for t in re.split(r"[^a-z0-9]+", str(doc.issuer or "").lower()) if len(t) >= 4]
-        if any(_normalize_text(t) in joined_norm for t in subject_tokens[:4]):
+    # Mededeling telt enkel mee voor de strikte match (met IBAN) of voor de bonus op ref_digits.
+    if iban_match or ref_digits:
+        ref_norm = _normalize_text(doc.structured_reference)
+        if ref_digits and ref_digits in _digits_only(joined):
             memo_match = True
-        elif any(_normalize_text(t) in joined_norm for t in issuer_tokens[:3]):
+        elif ref_norm and ref_norm in _joined_norm():
             memo_match = True
 
-    # Fallback rule requested: amount + IBAN is enough when tx date is within 3 months
-    # of the document date (not upload/create date).
-    doc_anchor = doc_date
-    within_three_months = False
-    if tx_date and doc_anchor:
-        try:
-            within_three_months = abs((tx_date.date() - doc_anchor.date()).days) <= 93
-        except Exception:
-            within_three_months = False
+        # Secondary "mededeling" hints if structured reference is missing/weak.
+        if not memo_match:
+            subject_tokens = [t for t in NON_ALNUM_RE.split(str(doc.subject or "").lower()) if len(t) >= 6]
+            issuer_tokens = [t for t in NON_ALNUM_RE.split(str(doc.issuer or "").lower()) if len(t) >= 4]
+            if any(_normalize_text(t) in _joined_norm() for t in subject_tokens[:4]):
+                memo_match = True
+            elif any(_normalize_text(t) in _joined_norm() for t in issuer_tokens[:3]):
+                memo_match = True
+
+    strict_match = iban_match and memo_match
+    fallback_match = iban_match and within_three_months
 
     # Third fallback: amount + document_date within 3 months + issuer-name part (>=4 chars)
     # appears in remittance/counterparty/raw.
     name_part_match = False
-    issuer_tokens = _issuer_token_candidates(doc.issuer)
-    for token in issuer_tokens[:6]:
-        if _normalize_text(token) in joined_norm:
-            name_part_match = True
-            break
+    if within_three_months and not strict_match and not fallback_match:
+        for token in _issuer_token_candidates(doc.issuer)[:6]:
+            if _normalize_text(token) in _joined_norm():
+                name_part_match = True
+                break
 
-    strict_match = iban_match and memo_match
-    fallback_match = iban_match and within_three_months
     fallback_name_match = within_three_months and name_part_match
     if not strict_match and not fallback_match and not fallback_name_match:
         return (-1, "none", "Geen voldoende IBAN/mededeling/naam-match")
@@ -1880,138 +2136,347 @@ def _amount_to_cents(value: float | int | None) -> int:
         return 0
 
 
-def _find_existing_bank_tx(
+def _index_txs_by_cents(txs: list[BankTransaction]) -> dict[int, list[tuple[int, BankTransaction]]]:
+    index: dict[int, list[tuple[int, BankTransaction]]] = {}
+    for pos, tx in enumerate(txs):
+        index.setdefault(_amount_to_cents(tx.amount), []).append((pos, tx))
+    return index
+
+
+def _prefilter_tx_candidates(doc: Document, tx_index: dict[int, list[tuple[int, BankTransaction]]]) -> list[BankTransaction]:
+    # Enkel transacties met (bijna) hetzelfde bedrag kunnen matchen; de exacte
+    # tolerantie (0.02) wordt nadien nog door _tx_match_score gecontroleerd.
+    amount = float(doc.total_amount or 0.0)
+    if amount <= 0:
+        return []
+    cents = _amount_to_cents(amount)
+    hits: list[tuple[int, BankTransaction]] = []
+    for c in range(cents - 3, cents + 4):
+        hits.extend(tx_index.get(c) or [])
+    hits.sort(key=lambda x: x[0])
+    return [tx for _, tx in hits]
+
+
+def _bank_tx_lookup(
     db: Session,
     *,
     tenant_id: str,
     bank_account_id: str,
-    external_transaction_id: str,
-    dedupe_hash: str | None,
-) -> BankTransaction | None:
-    ext = str(external_transaction_id or "").strip()
-    if ext:
-        row = (
-            db.query(BankTransaction)
-            .filter(
-                BankTransaction.bank_account_id == bank_account_id,
-                BankTransaction.tenant_id == tenant_id,
-                BankTransaction.external_transaction_id == ext,
-            )
-            .first()
-        )
-        if row:
-            return row
-    if dedupe_hash:
-        return (
-            db.query(BankTransaction)
-            .filter(
-                BankTransaction.bank_account_id == bank_account_id,
-                BankTransaction.tenant_id == tenant_id,
-                BankTransaction.dedupe_hash == dedupe_hash,
+    external_transaction_ids: set[str],
+    dedupe_hashes: set[str],
+) -> tuple[dict[str, dict], dict[str, dict]]:
+    # Bestaande transacties van de rekening in enkele IN-queries ophalen i.p.v. één lookup per rij.
+    records: dict[str, dict] = {}
+    by_ext: dict[str, dict] = {}
+    by_hash: dict[str, dict] = {}
+    for col, keys in (
+        (BankTransaction.external_transaction_id, sorted(k for k in external_transaction_ids if k)),
+        (BankTransaction.dedupe_hash, sorted(k for k in dedupe_hashes if k)),
+    ):
+        for start in range(0, len(keys), PURGE_BATCH_SIZE):
+            rows = (
+                db.query(BankTransaction.id, BankTransaction.external_transaction_id, BankTransaction.dedupe_hash)
+                .filter(
+                    BankTransaction.tenant_id == tenant_id,
+                    BankTransaction.bank_account_id == bank_account_id,
+                    col.in_(keys[start : start + PURGE_BATCH_SIZE]),
+                )
+                .all()
             )
-            .first()
-        )
-    return None
-
-
-def _enrich_budget_transactions_with_doc_links(db: Session, transactions: list[dict]) -> list[dict]:
-    if not transactions:
-        return []
+            for r in rows:
+                rec = records.setdefault(
+                    r.id,
+                    {"id": r.id, "external_transaction_id": r.external_transaction_id, "dedupe_hash": r.dedupe_hash},
+                )
+                if r.external_transaction_id:
+                    by_ext.setdefault(r.external_transaction_id, rec)
+                if r.dedupe_hash:
+                    by_hash.setdefault(r.dedupe_hash, rec)
+    return by_ext, by_hash
 
-    csv_import_ids = {
-        str(tx.get("csv_import_id") or "").strip()
-        for tx in transactions
-        if str(tx.get("csv_import_id") or "").strip()
-    }
-    csv_name_by_id: dict[str, str] = {}
-    if csv_import_ids:
-        rows = db.query(BankCsvImport.id, BankCsvImport.filename).filter(BankCsvImport.id.in_(csv_import_ids)).all()
-        csv_name_by_id = {str(r.id): str(r.filename or "") for r in rows}
 
-    tenant_ids = {str(tx.get("tenant_id") or "").strip() for tx in transactions if str(tx.get("tenant_id") or "").strip()}
-    docs_q = (
-        db.query(Document)
-        .filter(
-            Document.deleted_at.is_(None),
-            Document.paid.is_(True),
-            Document.total_amount.is_not(None),
-            Document.paid_on.is_not(None),
-        )
-    )
-    if tenant_ids:
-        docs_q = docs_q.filter(Document.tenant_id.in_(tenant_ids))
-    docs = docs_q.all()
-    by_key: dict[tuple[str, int], list[Document]] = {}
-    for doc in docs:
-        paid_on = str(doc.paid_on or "").strip()
-        if len(paid_on) < 10:
+def _upsert_bank_transactions(db: Session, *, tenant_id: str, bank_account_id: str, txs: list[dict]) -> int:
+    payloads: list[tuple[dict, str, str | None]] = []
+    for t in txs:
+        ext_id = str(t.get("external_transaction_id") or "").strip()
+        dedupe_hash = _tx_dedupe_hash_from_payload(t)
+        if not ext_id and not dedupe_hash:
             continue
-        key = (paid_on[:10], _amount_to_cents(doc.total_amount))
-        by_key.setdefault(key, []).append(doc)
+        payloads.append((t, ext_id, dedupe_hash))
+    if not payloads:
+        return 0
 
-    out: list[dict] = []
-    for tx in transactions:
-        row = dict(tx or {})
-        csv_import_id = str(row.get("csv_import_id") or "").strip()
-        if csv_import_id and csv_import_id in csv_name_by_id:
-            row["csv_filename"] = csv_name_by_id[csv_import_id]
-        booking_date = str(row.get("booking_date") or "").strip()
-        key = (booking_date[:10], _amount_to_cents(row.get("amount")))
-        candidates = by_key.get(key) or []
-        picked: Document | None = None
-        if len(candidates) == 1:
-            picked = candidates[0]
+    by_ext, by_hash = _bank_tx_lookup(
+        db,
+        tenant_id=tenant_id,
+        bank_account_id=bank_account_id,
+        external_transaction_ids={ext_id for _, ext_id, _ in payloads},
+        dedupe_hashes={h for _, _, h in payloads if h},
+    )
+    updates: dict[str, dict] = {}
+    inserts: list[dict] = []
+    new_ids: set[str] = set()
+    for t, ext_id, dedupe_hash in payloads:
+        # Match op extern transactie-id krijgt voorrang op de dedupe-hash.
+        rec = (by_ext.get(ext_id) if ext_id else None) or (by_hash.get(dedupe_hash) if dedupe_hash else None)
+        values = {
+            "dedupe_hash": dedupe_hash,
+            "booking_date": t.get("booking_date"),
+            "value_date": t.get("value_date"),
+            "amount": t.get("amount"),
+            "currency": t.get("currency"),
+            "counterparty_name": t.get("counterparty_name"),
+            "remittance_information": t.get("remittance_information"),
+            "raw_json": t.get("raw_json"),
+        }
+        if rec is not None:
+            rec.update(values)
+            rec["external_transaction_id"] = ext_id or rec["external_transaction_id"]
+            if rec["id"] not in new_ids:
+                updates[rec["id"]] = rec
+        else:
+            rec = {
+                "id": str(uuid.uuid4()),
+                "tenant_id": tenant_id,
+                "bank_account_id": bank_account_id,
+                "external_transaction_id": ext_id or f"dedupe_{dedupe_hash[:16]}",
+                **values,
+            }
+            new_ids.add(rec["id"])
+            inserts.append(rec)
+        # Dubbels binnen dezelfde batch werken dezelfde rij bij i.p.v. een tweede insert te doen.
+        by_ext.setdefault(rec["external_transaction_id"], rec)
+        if dedupe_hash:
+            by_hash.setdefault(dedupe_hash, rec)
+
+    if updates:
+        db.execute(update(BankTransaction), list(updates.values()))
+    if inserts:
+        db.execute(insert(BankTransaction), inserts)
+    return len(payloads)
+
+
+def _insert_budget_analysis_txs(
+    db: Session, *, tenant_id: str, run_id: str, transactions: list[dict] | None, default_source: str
+) -> None:
+    # Eén executemany-INSERT i.p.v. een ORM-object per geanalyseerde transactie.
+    rows = [
+        {
+            "tenant_id": tenant_id,
+            "run_id": run_id,
+            "external_transaction_id": str(item.get("external_transaction_id") or ""),
+            "booking_date": item.get("booking_date"),
+            "amount": item.get("amount"),
+            "currency": item.get("currency"),
+            "counterparty_name": item.get("counterparty_name"),
+            "remittance_information": item.get("remittance_information"),
+            "flow": str(item.get("flow") or "expense"),
+            "category": str(item.get("category") or "Ongecategoriseerd"),
+            "source": str(item.get("source") or default_source),
+            "reason": item.get("reason"),
+        }
+        for item in transactions or []
+    ]
+    if rows:
+        db.execute(insert(BankBudgetAnalysisTx), rows)
+
+
+def _index_by_external_id(transactions: list[dict] | None) -> dict[str, dict]:
+    # Eerste treffer per external_transaction_id wint, zoals de vroegere lineaire zoektocht.
+    out: dict[str, dict] = {}
+    for item in transactions or []:
+        out.setdefault(str(item.get("external_transaction_id") or "").strip(), item)
+    return out
+
+
+def _load_budget_tx_payload(db: Session, tenant_id: str, account_id: str) -> tuple[list[dict], list[str]]:
+    # Kolomrijen (geen ORM-objecten/identity map) per batch van 1000 rechtstreeks omzetten naar dicts;
+    # bank_transaction_to_out leest enkel attributen. csv_import_ids wordt in dezelfde pass verzameld.
+    tx_payload: list[dict] = []
+    csv_import_ids: set[str] = set()
+    q = (
+        db.query(*BankTransaction.__table__.c)
+        .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == account_id)
+        .order_by(BankTransaction.booking_date.asc(), BankTransaction.created_at.asc())
+        .yield_per(1000)
+    )
+    for row in q:
+        tx_payload.append(bank_transaction_to_out(row))
+        if row.csv_import_id:
+            csv_import_ids.add(str(row.csv_import_id))
+    return tx_payload, sorted(csv_import_ids)
+
+
+def _mark_csv_imports_parsed(db: Session, tenant_id: str, csv_import_ids: list[str], source_hash: str) -> bool:
+    # Enkel imports met een andere parsed_source_hash bijwerken; bij een cache-hit op ongewijzigde data
+    # wordt zo geen UPDATE (en dus geen write-lock) uitgevoerd. Commit gebeurt door de caller.
+    if not csv_import_ids:
+        return False
+    stale = (
+        BankCsvImport.tenant_id == tenant_id,
+        BankCsvImport.id.in_(csv_import_ids),
+        or_(BankCsvImport.parsed_source_hash.is_(None), BankCsvImport.parsed_source_hash != source_hash),
+    )
+    if not db.query(db.query(BankCsvImport.id).filter(*stale).exists()).scalar():
+        return False
+    db.query(BankCsvImport).filter(*stale).update(
+        {
+            BankCsvImport.parsed_at: datetime.utcnow(),
+            BankCsvImport.parsed_source_hash: source_hash,
+        },
+        synchronize_session=False,
+    )
+    return True
+
+
+def _enrich_budget_transactions_with_doc_links_inplace(
+    db: Session, tenant_id: str, transactions: list[dict], doc_link_cache: dict | None = None
+) -> list[dict]:
+    # Variant zonder kopie: vult de meegegeven rijen zelf aan. Enkel voor lijsten die de caller net zelf opbouwde.
+    # tenant_id komt van de caller: analyse-rijen uit _build_budget_analysis_payload bevatten geen tenant_id.
+    # doc_link_cache: optioneel request-scoped dict; een tweede verrijking in dezelfde request (bv. na de
+    # analyse) hergebruikt dan de al opgehaalde CSV-bestandsnamen en documenten per betaaldag.
+    if not transactions:
+        return transactions
+    cache = doc_link_cache if doc_link_cache is not None else {}
+    csv_name_by_id: dict[str, str] = cache.setdefault("csv_names", {})
+    docs_by_day: dict[tuple[str, str], list] = cache.setdefault("docs_by_day", {})
+
+    csv_import_ids = {cid for tx in transactions if (cid := _s(tx.get("csv_import_id")))} - csv_name_by_id.keys()
+    if csv_import_ids:
+        rows = (
+            db.query(BankCsvImport.id, BankCsvImport.filename)
+            .filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(csv_import_ids))
+            .all()
+        )
+        csv_name_by_id.update({str(r.id): str(r.filename or "") for r in rows})
+
+    # Enkel documenten ophalen waarvan de betaaldag voorkomt bij de transacties.
+    # (dag, centen)-sleutel één keer per transactie berekenen; wordt hieronder hergebruikt bij het koppelen.
+    tx_keys: list[tuple[str, int] | None] = []
+    for tx in transactions:
+        booking_date = _s(tx.get("booking_date"))
+        tx_keys.append((booking_date[:10], _amount_to_cents(tx.get("amount"))) if len(booking_date) >= 10 else None)
+    wanted = {key for key in tx_keys if key is not None}
+    wanted_days = sorted({day for day, _ in wanted})
+    paid_day = func.substr(func.trim(Document.paid_on), 1, 10)
+    missing_days = [day for day in wanted_days if (tenant_id, day) not in docs_by_day]
+    for start in range(0, len(missing_days), DOC_LINK_DAY_BATCH_SIZE):
+        batch_days = missing_days[start : start + DOC_LINK_DAY_BATCH_SIZE]
+        # Kolommen i.p.v. entiteiten: blijven bruikbaar na een commit tussen twee verrijkingen door.
+        docs_q = db.query(
+            Document.id,
+            Document.issuer,
+            Document.subject,
+            Document.filename,
+            Document.paid_on,
+            Document.total_amount,
+        ).filter(
+            Document.tenant_id == tenant_id,
+            Document.deleted_at.is_(None),
+            Document.paid.is_(True),
+            Document.total_amount.is_not(None),
+            Document.paid_on.is_not(None),
+            paid_day.in_(batch_days),
+        )
+        for day in batch_days:
+            docs_by_day[(tenant_id, day)] = []
+        for doc in docs_q.order_by(Document.created_at.asc(), Document.id.asc()).all():
+            paid_on = _s(doc.paid_on)
+            if len(paid_on) >= 10 and (tenant_id, paid_on[:10]) in docs_by_day:
+                docs_by_day[(tenant_id, paid_on[:10])].append(doc)
+
+    by_key: dict[tuple[str, int], list] = {}
+    for day in wanted_days:
+        for doc in docs_by_day[(tenant_id, day)]:
+            key = (day, _amount_to_cents(doc.total_amount))
+            if key in wanted:
+                by_key.setdefault(key, []).append(doc)
+
+    # Genormaliseerde issuer-/onderwerptokens per document; kandidaten komen vaak terug over transacties heen.
+    doc_tokens: dict[str, tuple[list[str], list[str]]] = {}
+    for row, key in zip(transactions, tx_keys):
+        if (csv_import_id := _s(row.get("csv_import_id"))) and csv_import_id in csv_name_by_id:
+            row["csv_filename"] = csv_name_by_id[csv_import_id]
+        candidates = by_key.get(key) or []
+        picked = None
+        if len(candidates) == 1:
+            picked = candidates[0]
         elif len(candidates) > 1:
-            haystack = _normalize_text(
-                f"{str(row.get('counterparty_name') or '')} {str(row.get('remittance_information') or '')}"
-            )
-            best_score = -1
-            for doc in candidates:
-                score = 0
-                for tok in _issuer_token_candidates(doc.issuer):
-                    t = _normalize_text(tok)
-                    if t and t in haystack:
-                        score += 2
-                subject_tokens = [t for t in re.split(r"[^a-z0-9]+", str(doc.subject or "").lower()) if len(t) >= 5]
-                for tok in subject_tokens[:3]:
-                    t = _normalize_text(tok)
-                    if t and t in haystack:
-                        score += 1
-                if score > best_score:
-                    best_score = score
-                    picked = doc
+            # Bij gelijke score wint de eerste kandidaat; zonder afzender/onderwerp of tegenpartijtekst scoort alles 0.
+            picked = candidates[0]
+            haystack_raw = f"{_s(row.get('counterparty_name'))} {_s(row.get('remittance_information'))}".lower()
+            haystack = NON_ALNUM_RE.sub("", haystack_raw)
+            if haystack and any(doc.issuer or doc.subject for doc in candidates):
+                # Hele woorden via set-lookup; substring in de genormaliseerde tekst blijft de fallback (bv. "proximus12345").
+                haystack_tokens = set(NON_ALNUM_RE.split(haystack_raw))
+                best_score = 0
+                for doc in candidates:
+                    if not (doc.issuer or doc.subject):
+                        continue
+                    tokens = doc_tokens.get(doc.id)
+                    if tokens is None:
+                        issuer_tokens = (
+                            [t for t in (_normalize_text(tok) for tok in _issuer_token_candidates(doc.issuer)) if t]
+                            if doc.issuer
+                            else []
+                        )
+                        subject_tokens = [t for t in NON_ALNUM_RE.split(str(doc.subject or "").lower()) if len(t) >= 5]
+                        tokens = (issuer_tokens, [t for t in (_normalize_text(tok) for tok in subject_tokens[:3]) if t])
+                        doc_tokens[doc.id] = tokens
+                    score = 2 * sum(1 for t in tokens[0] if t in haystack_tokens or t in haystack) + sum(
+                        1 for t in tokens[1] if t in haystack_tokens or t in haystack
+                    )
+                    if score > best_score:
+                        best_score = score
+                        picked = doc
         if picked:
             row["linked_document_id"] = picked.id
-            row["linked_document_title"] = str(picked.subject or picked.filename or "").strip() or "Document"
-        out.append(row)
-    return out
+            row["linked_document_title"] = _s(picked.subject or picked.filename) or "Document"
+    return transactions
 
 
 def _attach_budget_document_context(db: Session, transactions: list[dict]) -> list[dict]:
     if not transactions:
         return []
-    out = [dict(t or {}) for t in transactions]
-    doc_ids = {str(t.get("linked_document_id") or "").strip() for t in out if str(t.get("linked_document_id") or "").strip()}
+    # Rijen komen altijd van _enrich_budget_transactions_with_doc_links_inplace (eigen lijsten): in-place aanvullen.
+    out = transactions
+    doc_ids = {did for t in out if (did := _s(t.get("linked_document_id")))}
     if not doc_ids:
         return out
-    tenant_ids = {str(t.get("tenant_id") or "").strip() for t in out if str(t.get("tenant_id") or "").strip()}
-    docs_q = db.query(Document).filter(Document.id.in_(doc_ids))
+    tenant_ids = {tid for t in out if (tid := _s(t.get("tenant_id")))}
+    docs_q = (
+        db.query(Document)
+        .options(
+            load_only(
+                Document.id,
+                Document.tenant_id,
+                Document.category,
+                Document.issuer,
+                Document.subject,
+                Document.total_amount,
+                Document.currency,
+                Document.iban,
+                Document.structured_reference,
+            )
+        )
+        .filter(Document.id.in_(doc_ids))
+    )
     if tenant_ids:
         docs_q = docs_q.filter(Document.tenant_id.in_(tenant_ids))
     docs = docs_q.all()
     by_id = {str(d.id): d for d in docs}
     for row in out:
-        did = str(row.get("linked_document_id") or "").strip()
-        if not did or did not in by_id:
+        doc = by_id.get(_s(row.get("linked_document_id")))
+        if doc is None:
             continue
-        doc = by_id[did]
         parts = [
-            f"categorie={str(doc.category or '').strip()}",
-            f"afzender={str(doc.issuer or '').strip()}",
-            f"onderwerp={str(doc.subject or '').strip()}",
-            f"bedrag={str(doc.total_amount or '')} {str(doc.currency or '').strip()}",
-            f"iban={str(doc.iban or '').strip()}",
-            f"mededeling={str(doc.structured_reference or '').strip()}",
+            f"categorie={_s(doc.category)}",
+            f"afzender={_s(doc.issuer)}",
+            f"onderwerp={_s(doc.subject)}",
+            f"bedrag={str(doc.total_amount or '')} {_s(doc.currency)}",
+            f"iban={_s(doc.iban)}",
+            f"mededeling={_s(doc.structured_reference)}",
         ]
         row["linked_document_context"] = " | ".join([p for p in parts if not p.endswith("=")]).strip()
     return out
@@ -2038,51 +2503,63 @@ def _current_user_can_see_all_groups(user: User) -> bool:
 def _purge_expired_deleted_docs(db: Session, tenant_id: str) -> None:
     cutoff = datetime.utcnow() - timedelta(days=7)
     expired_docs = (
-        db.query(Document)
+        db.query(
+            Document.id,
+            Document.file_path,
+            Document.original_file_path,
+            Document.preprocessed_file_path,
+            Document.thumbnail_path,
+        )
         .filter(Document.tenant_id == tenant_id, Document.deleted_at.is_not(None), Document.deleted_at < cutoff)
         .all()
     )
     if not expired_docs:
         return
 
-    with engine.begin() as conn:
-        for d in expired_docs:
-            conn.execute(text("DELETE FROM document_labels WHERE document_id = :id"), {"id": d.id})
-            conn.execute(text("DELETE FROM document_search WHERE document_id = :id"), {"id": d.id})
+    # Per batch drie statements i.p.v. drie per document (SQLite: max ~999 parameters).
+    ids = [str(d.id) for d in expired_docs]
+    for start in range(0, len(ids), PURGE_BATCH_SIZE):
+        batch = ids[start : start + PURGE_BATCH_SIZE]
+        db.execute(document_labels.delete().where(document_labels.c.document_id.in_(batch)))
+        db.execute(
+            text("DELETE FROM document_search WHERE document_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": batch},
+        )
+        db.execute(Document.__table__.delete().where(Document.id.in_(batch)))
+    db.commit()
 
+    paths: list[Path] = []
     for d in expired_docs:
-        try:
-            if d.file_path:
-                Path(d.file_path).unlink(missing_ok=True)
-        except Exception:
-            pass
-        try:
-            if getattr(d, "original_file_path", None):
-                Path(str(d.original_file_path)).unlink(missing_ok=True)
-        except Exception:
-            pass
-        try:
-            if getattr(d, "preprocessed_file_path", None):
-                Path(str(d.preprocessed_file_path)).unlink(missing_ok=True)
-        except Exception:
-            pass
-        try:
-            if d.thumbnail_path:
-                thumb = d.thumbnail_path.replace("/thumbnails/", "").strip()
-                if thumb:
-                    Path(settings.thumbnails_dir, thumb).unlink(missing_ok=True)
-        except Exception:
-            pass
-        db.delete(d)
-    db.commit()
+        for p in (d.file_path, d.original_file_path, d.preprocessed_file_path):
+            if p:
+                paths.append(Path(str(p)))
+        thumb = str(d.thumbnail_path or "").replace("/thumbnails/", "").strip()
+        if thumb:
+            paths.append(Path(settings.thumbnails_dir, thumb))
+    if len(paths) <= 1:
+        for p in paths:
+            _try_unlink(p)
+        return
+    # Bestanden parallel verwijderen: op trage/netwerkopslag overlapt de I/O.
+    with ThreadPoolExecutor(max_workers=min(PURGE_UNLINK_WORKERS, len(paths))) as ex:
+        list(ex.map(_try_unlink, paths))
+
+
+def _try_unlink(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except Exception:
+        pass
 
 
 def _build_searchable_text(doc: Document) -> str:
     label_text = " ".join([label.name for label in (doc.labels or [])])
     extra_values = ""
-    if doc.extra_fields_json:
+    raw_extra = str(doc.extra_fields_json or "").strip()
+    # Enkel een niet-leeg JSON-object levert waarden op; "{}", lijsten en rommel niet door de parser halen.
+    if raw_extra.startswith("{") and raw_extra != "{}":
         try:
-            loaded = json.loads(doc.extra_fields_json)
+            loaded = json.loads(raw_extra)
             if isinstance(loaded, dict):
                 extra_values = " ".join(
                     f"{str(k)} {str(v)}" for k, v in loaded.items() if k and v is not None and str(v).strip()
@@ -2112,9 +2589,22 @@ def _build_searchable_text(doc: Document) -> str:
     )
 
 
+def _configure_threadpool() -> None:
+    # Sync endpoints draaien in AnyIO's threadpool (standaard 40 threads); trage externe calls houden die bezet.
+    size = int(getattr(settings, "api_threadpool_size", 0) or 0)
+    if size <= 0:
+        return
+    try:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = size
+    except Exception:
+        # Buiten een event loop (bv. scripts) is er geen limiter om aan te passen.
+        log.debug("Threadpool-limiet niet aangepast (geen event loop)")
+
+
 @app.on_event("startup")
 def startup() -> None:
     global MAIL_INGEST_THREAD, DOCUMENT_JOB_THREAD
+    _configure_threadpool()
     ensure_dirs()
     init_db()
     ensure_bootstrap_admin()
@@ -2151,9 +2641,8 @@ def login(payload: LoginIn, request: Request, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email).first()
     if not user or not verify_password(payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Ongeldige login")
-    token = issue_token(db, user)
     try:
-        audit_log(
+        audit_log_insert(
             db,
             tenant_id=str(getattr(user, "tenant_id", "") or ""),
             user_id=str(user.id),
@@ -2164,9 +2653,10 @@ def login(payload: LoginIn, request: Request, db: Session = Depends(get_db)):
             ip=str(getattr(getattr(request, "client", None), "host", "") or "") or None,
             user_agent=str(request.headers.get("user-agent") or "") or None,
         )
-        db.commit()
     except Exception:
         db.rollback()
+    # issue_token commit ook de auditregel: één transactie voor login.
+    token = issue_token(db, user)
     return {"token": token, "user": user_to_out(user, tenant_name=_tenant_name_for_id(db, user.tenant_id))}
 
 
@@ -2181,7 +2671,7 @@ def logout_api(
     if session_row and str(session_row.user_id or "") == str(current_user.id or ""):
         db.delete(session_row)
         try:
-            audit_log(
+            audit_log_insert(
                 db,
                 tenant_id=_tenant_id_for_user(current_user),
                 user_id=str(current_user.id),
@@ -2235,6 +2725,11 @@ def signup(payload: SignupIn, db: Session = Depends(get_db)):
     return {"token": token, "user": user_to_out(user, tenant_name=_tenant_name_for_id(db, user.tenant_id))}
 
 
+def _reset_token_hash(raw_token: str) -> str:
+    # Tokens zijn ASCII (token_urlsafe): zelfde digest als via utf-8, zonder de utf-8 encoder.
+    return hashlib.sha256(raw_token.encode("ascii")).hexdigest()
+
+
 @app.post("/api/auth/forgot-password")
 def forgot_password(payload: ForgotPasswordIn, request: Request, db: Session = Depends(get_db)):
     email = str(payload.email or "").strip().lower()
@@ -2254,7 +2749,7 @@ def forgot_password(payload: ForgotPasswordIn, request: Request, db: Session = D
     ).update({"used_at": now}, synchronize_session=False)
 
     raw_token = secrets.token_urlsafe(32)
-    token_hash = hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+    token_hash = _reset_token_hash(raw_token)
     reset_row = PasswordResetToken(
         tenant_id=user.tenant_id,
         user_id=user.id,
@@ -2289,7 +2784,8 @@ def reset_password(payload: ResetPasswordIn, db: Session = Depends(get_db)):
     raw_token = str(payload.token or "").strip()
     password = str(payload.password or "")
     confirm = str(payload.confirm_password or "")
-    if not email or not raw_token:
+    # token_urlsafe levert enkel ASCII; alles daarbuiten kan nooit een geldige token zijn.
+    if not email or not raw_token or not raw_token.isascii():
         raise HTTPException(status_code=400, detail="Reset link is ongeldig")
     if len(password) < 8:
         raise HTTPException(status_code=400, detail="Wachtwoord moet minstens 8 karakters zijn")
@@ -2300,7 +2796,7 @@ def reset_password(payload: ResetPasswordIn, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=400, detail="Reset link is ongeldig of verlopen")
 
-    token_hash = hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+    token_hash = _reset_token_hash(raw_token)
     now = datetime.utcnow()
     row = (
         db.query(PasswordResetToken)
@@ -2317,8 +2813,12 @@ def reset_password(payload: ResetPasswordIn, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Reset link is ongeldig of verlopen")
 
     user.password_hash = hash_password(password)
-    row.used_at = now
-    db.query(SessionToken).filter(SessionToken.user_id == user.id).delete()
+    # Alle openstaande resetlinks van deze gebruiker (incl. deze) in één bulk-update ongeldig maken.
+    db.query(PasswordResetToken).filter(
+        PasswordResetToken.user_id == user.id,
+        PasswordResetToken.used_at.is_(None),
+    ).update({"used_at": now}, synchronize_session=False)
+    db.query(SessionToken).filter(SessionToken.user_id == user.id).delete(synchronize_session=False)
     db.commit()
     return {"ok": True}
 
@@ -2343,11 +2843,15 @@ def update_me(
     if not EMAIL_RE.match(email):
         raise HTTPException(status_code=400, detail="Email formaat is ongeldig")
 
-    conflict = db.query(User).filter(
-        User.tenant_id == str(getattr(current_user, "tenant_id", "") or ""),
-        User.email == email,
-        User.id != current_user.id,
-    ).first()
+    conflict = db.query(
+        db.query(User.id)
+        .filter(
+            User.tenant_id == str(getattr(current_user, "tenant_id", "") or ""),
+            User.email == email,
+            User.id != current_user.id,
+        )
+        .exists()
+    ).scalar()
     if conflict:
         raise HTTPException(status_code=400, detail="Email bestaat al")
 
@@ -2375,10 +2879,17 @@ async def upload_my_avatar(
         ext = ".jpg"
     avatar_name = f"{current_user.id}_{uuid.uuid4().hex}{ext}"
     avatar_fs_path = Path(settings.avatars_dir) / avatar_name
-    content = await file.read()
-    if len(content) > 5 * 1024 * 1024:
+    # In blokken naar schijf schrijven en de limiet tijdens het lezen bewaken i.p.v. alles in geheugen te laden.
+    total = 0
+    with avatar_fs_path.open("wb") as fh:
+        while chunk := await file.read(AVATAR_UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > AVATAR_MAX_BYTES:
+                break
+            fh.write(chunk)
+    if total > AVATAR_MAX_BYTES:
+        avatar_fs_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail="Avatar is te groot (max 5MB)")
-    avatar_fs_path.write_bytes(content)
 
     old_avatar = (current_user.avatar_path or "").strip()
     current_user.avatar_path = f"/avatars/{avatar_name}"
@@ -2431,10 +2942,11 @@ def list_tenants(
         rows = db.query(Tenant).filter(Tenant.id == active_tenant_id).order_by(Tenant.created_at.asc()).all()
     else:
         raise HTTPException(status_code=403, detail="Alleen administrators hebben toegang")
+    stats_by_tenant = _tenant_stats_bulk(db, [str(row.id) for row in rows])
     out = []
     for row in rows:
         tid = str(row.id)
-        stats = _tenant_stats(db, tid)
+        stats = stats_by_tenant.get(tid) or _empty_tenant_stats()
         out.append(
             {
                 "id": tid,
@@ -2461,7 +2973,7 @@ def create_tenant(
     if not name:
         raise HTTPException(status_code=400, detail="Tenant naam is verplicht")
 
-    exists_slug = db.query(Tenant).filter(func.lower(Tenant.slug) == slug.lower()).first()
+    exists_slug = db.query(db.query(Tenant.id).filter(func.lower(Tenant.slug) == slug.lower()).exists()).scalar()
     if exists_slug:
         raise HTTPException(status_code=400, detail="Tenant slug bestaat al")
 
@@ -2498,6 +3010,7 @@ def update_tenant(
     tenant.name = name
     db.commit()
     db.refresh(tenant)
+    _invalidate_tenant_name_cache(str(tenant.id))
     active_tenant_id = _tenant_id_for_user(current_user)
     tid = str(tenant.id)
     stats = _tenant_stats(db, tid)
@@ -2518,7 +3031,6 @@ def list_tenant_users(
     if not user_is_admin(current_user):
         raise HTTPException(status_code=403, detail="Alleen administrators hebben toegang")
     active_tenant_id = _tenant_id_for_user(current_user)
-    tenants = {str(t.id): t for t in db.query(Tenant).all()}
     q = db.query(User)
     if current_user.is_bootstrap_admin:
         rows = q.order_by(User.name.asc(), User.email.asc()).all()
@@ -2529,17 +3041,22 @@ def list_tenant_users(
             .order_by(User.name.asc(), User.email.asc())
             .all()
         )
+    tenant_ids = {str(row.tenant_id) for row in rows if row.tenant_id}
+    tenant_names = (
+        {str(tid): str(name or "") for tid, name in db.query(Tenant.id, Tenant.name).filter(Tenant.id.in_(tenant_ids)).all()}
+        if tenant_ids
+        else {}
+    )
     out = []
     for row in rows:
         tid = str(row.tenant_id or "")
-        tenant = tenants.get(tid)
         out.append(
             {
                 "id": row.id,
                 "name": row.name,
                 "email": row.email,
                 "tenant_id": tid,
-                "tenant_name": tenant.name if tenant else "",
+                "tenant_name": tenant_names.get(tid, ""),
                 "is_bootstrap_admin": bool(row.is_bootstrap_admin),
             }
         )
@@ -2662,9 +3179,15 @@ def providers(
 def my_groups(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_dep)):
     tenant_id = _tenant_id_for_user(current_user)
     if _current_user_can_see_all_groups(current_user):
-        all_groups = db.query(Group).filter(Group.tenant_id == tenant_id).order_by(Group.name.asc()).all()
-        return [group_to_out(g) for g in all_groups]
-    return [group_to_out(g) for g in current_user.groups if str(g.tenant_id or "") == tenant_id]
+        all_groups = (
+            db.query(Group)
+            .options(selectinload(Group.users))
+            .filter(Group.tenant_id == tenant_id)
+            .order_by(Group.name.asc())
+            .all()
+        )
+        return JSONResponse([group_to_out(g) for g in all_groups])
+    return JSONResponse([group_to_out(g) for g in current_user.groups if str(g.tenant_id or "") == tenant_id])
 
 
 @app.get("/api/categories", response_model=list[CategoryOut])
@@ -2687,7 +3210,11 @@ def create_category(
     if not name:
         raise HTTPException(status_code=400, detail="Categorie is verplicht")
 
-    existing = db.query(CategoryCatalog).filter(CategoryCatalog.tenant_id == tenant_id, func.lower(CategoryCatalog.name) == name.lower()).first()
+    existing = (
+        db.query(CategoryCatalog)
+        .filter(CategoryCatalog.tenant_id == tenant_id, CategoryCatalog.normalized_name == normalize_category_name(name))
+        .first()
+    )
     if existing:
         return _category_to_out(existing, existing.name)
 
@@ -2720,55 +3247,50 @@ def update_category(
     if not old_name or not new_name:
         raise HTTPException(status_code=400, detail="Categorie naam is verplicht")
 
-    row = db.query(CategoryCatalog).filter(CategoryCatalog.tenant_id == tenant_id, func.lower(CategoryCatalog.name) == old_name.lower()).first()
+    old_norm = normalize_category_name(old_name)
+    new_norm = normalize_category_name(new_name)
+    # Huidige rij en mogelijke naamconflicten in één query ophalen.
+    candidates = (
+        db.query(CategoryCatalog)
+        .filter(CategoryCatalog.tenant_id == tenant_id, CategoryCatalog.normalized_name.in_({old_norm, new_norm}))
+        .all()
+    )
+    row = next((r for r in candidates if r.normalized_name == old_norm), None)
     if not row:
         row = CategoryCatalog(tenant_id=tenant_id, name=old_name)
         db.add(row)
         db.flush()
 
-    conflict = db.query(CategoryCatalog).filter(
-        CategoryCatalog.tenant_id == tenant_id,
-        func.lower(CategoryCatalog.name) == new_name.lower(),
-        CategoryCatalog.id != row.id,
-    ).first()
-    if conflict:
+    if new_norm != old_norm and any(r.normalized_name == new_norm for r in candidates):
         raise HTTPException(status_code=400, detail="Categorie naam bestaat al")
 
     old_doc_name = row.name
     row.name = new_name
     row.prompt_template = (payload.prompt_template or "").strip() or None
     fields_set = getattr(payload, "model_fields_set", getattr(payload, "__fields_set__", set()))
-    normalized_config: list[dict] = []
+    # Dict houdt de eerste entry per key en de volgorde in één structuur bij.
+    config_by_key: dict[str, dict] = {}
     if "parse_config" in fields_set:
-        seen = set()
         for item in (payload.parse_config or []):
             key = str(item.key or "").strip().lower().replace(" ", "_")
-            if not key or key in seen:
-                continue
-            seen.add(key)
-            normalized_config.append(
-                {
-                    "key": key,
-                    "visible_in_overview": bool(item.visible_in_overview),
-                }
-            )
+            if key:
+                config_by_key.setdefault(key, {"key": key, "visible_in_overview": bool(item.visible_in_overview)})
     else:
-        seen = set()
         for x in (payload.parse_fields or []):
             key = str(x or "").strip().lower().replace(" ", "_")
-            if not key or key in seen:
-                continue
-            seen.add(key)
-            normalized_config.append({"key": key, "visible_in_overview": True})
+            if key:
+                config_by_key.setdefault(key, {"key": key, "visible_in_overview": True})
 
-    normalized_fields = [x["key"] for x in normalized_config]
+    normalized_config = list(config_by_key.values())
+    normalized_fields = list(config_by_key)
     row.parse_fields_json = json.dumps(normalized_fields)
     row.parse_config_json = json.dumps(normalized_config)
     row.paid_default = payload.paid_default if payload.paid_default is not None else False
 
-    docs = db.query(Document).filter(Document.tenant_id == tenant_id, func.lower(Document.category) == old_doc_name.lower()).all()
-    for d in docs:
-        d.category = new_name
+    # Eén bulk-UPDATE i.p.v. alle documenten als ORM-objecten te laden en per rij te schrijven.
+    db.query(Document).filter(Document.tenant_id == tenant_id, func.lower(Document.category) == old_doc_name.lower()).update(
+        {"category": new_name}, synchronize_session=False
+    )
 
     db.commit()
     db.refresh(row)
@@ -2798,7 +3320,11 @@ def delete_category(
             detail="Categorie kan niet verwijderd worden: er hangen nog documenten aan.",
         )
 
-    row = db.query(CategoryCatalog).filter(CategoryCatalog.tenant_id == tenant_id, func.lower(CategoryCatalog.name) == name.lower()).first()
+    row = (
+        db.query(CategoryCatalog)
+        .filter(CategoryCatalog.tenant_id == tenant_id, CategoryCatalog.normalized_name == normalize_category_name(name))
+        .first()
+    )
     if not row:
         raise HTTPException(status_code=404, detail="Categorie niet gevonden in catalogus")
 
@@ -2812,7 +3338,7 @@ def list_labels(db: Session = Depends(get_db), current_user: User = Depends(get_
     tenant_id = _tenant_id_for_user(current_user)
     # Keep bank categories available as labels, so documents can be tagged consistently.
     try:
-        _ensure_bank_category_labels(db, tenant_id)
+        _ensure_bank_category_labels_once(db, tenant_id)
     except Exception:
         db.rollback()
     if not GROUPS_ENABLED or _current_user_can_see_all_groups(current_user):
@@ -2845,24 +3371,32 @@ def create_label(
     if not name:
         raise HTTPException(status_code=400, detail="Label naam is verplicht")
 
-    existing = db.query(Label).filter(
-        Label.tenant_id == tenant_id,
-        func.lower(func.trim(Label.name)) == name.lower(),
+    # Eén INSERT; uq_labels_tenant_normname vangt dubbels af (ook bij gelijktijdige requests).
+    created = db.execute(
+        sqlite_insert(Label)
+        .values(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant_id,
+            name=name,
+            normalized_name=normalize_label_name(name),
+            group_id=group_id,
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing()
+        .returning(Label.id, Label.name, Label.group_id)
     ).first()
-    if existing:
+    if created is None:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Label bestaat al")
-
-    label = Label(tenant_id=tenant_id, name=name, group_id=group_id)
-    db.add(label)
     db.commit()
-    db.refresh(label)
-    return {"id": label.id, "name": label.name, "group_id": label.group_id}
+    return {"id": created.id, "name": created.name, "group_id": created.group_id}
 
 
 @app.put("/api/documents/{document_id}/labels", response_model=DocumentOut)
 def set_document_labels(
     document_id: str,
     payload: SetDocumentLabelsIn,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dep),
 ):
@@ -2875,14 +3409,15 @@ def set_document_labels(
             labels = db.query(Label).filter(Label.id.in_(chosen_ids), Label.tenant_id == doc.tenant_id).all()
 
     if labels:
-        doc.labels = labels
+        # _ensure_doc_single_label schrijft de koppeling zelf weg; doc.labels hier niet ook nog zetten.
         chosen = str(labels[0].name or "").strip()
         if chosen:
             doc.budget_category = chosen
             doc.budget_category_source = "manual"
+        else:
+            doc.labels = labels
         _ensure_doc_single_label(db, doc)
     else:
-        db.execute(text("DELETE FROM document_labels WHERE document_id = :doc_id"), {"doc_id": str(doc.id)})
         doc.labels = []
         doc.budget_category = None
         doc.budget_category_source = None
@@ -2893,7 +3428,8 @@ def set_document_labels(
     searchable = searchable + "\n" + " ".join([l.name for l in labels])
     from app.db import upsert_search_index
 
-    upsert_search_index(doc.id, searchable)
+    # Zoekindex pas na het antwoord bijwerken; de client hoeft daar niet op te wachten.
+    background_tasks.add_task(upsert_search_index, doc.id, searchable)
 
     return document_to_out(doc)
 
@@ -2903,8 +3439,16 @@ def list_users(db: Session = Depends(get_db), current_user: User = Depends(get_c
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
     tenant_name = _tenant_name_for_id(db, tenant_id)
-    users = db.query(User).filter(User.tenant_id == tenant_id).order_by(User.created_at.asc()).all()
-    return [user_to_out(u, tenant_name=tenant_name) for u in users]
+    # user_to_out leest u.groups (rol, admin, group_ids): in één batch laden i.p.v. per gebruiker.
+    users = (
+        db.query(User)
+        .options(selectinload(User.groups))
+        .filter(User.tenant_id == tenant_id)
+        .order_by(User.created_at.asc())
+        .all()
+    )
+    # De dicts zijn al JSON-klaar en volgen UserOut: niet per item opnieuw valideren via response_model.
+    return JSONResponse([user_to_out(u, tenant_name=tenant_name) for u in users])
 
 
 @app.post("/api/admin/users", response_model=UserOut)
@@ -2921,7 +3465,9 @@ def create_user(
     if not email:
         raise HTTPException(status_code=400, detail="Email/login is verplicht")
 
-    existing = db.query(User).filter(User.tenant_id == tenant_id, func.lower(User.email) == email.lower()).first()
+    existing = db.query(
+        db.query(User.id).filter(User.tenant_id == tenant_id, func.lower(User.email) == email.lower()).exists()
+    ).scalar()
     if existing:
         raise HTTPException(status_code=400, detail="Email bestaat al")
 
@@ -2964,7 +3510,9 @@ def update_user(
     if not email or not name:
         raise HTTPException(status_code=400, detail="Naam en email/login zijn verplicht")
 
-    conflict = db.query(User).filter(User.tenant_id == tenant_id, User.email == email, User.id != user.id).first()
+    conflict = db.query(
+        db.query(User.id).filter(User.tenant_id == tenant_id, User.email == email, User.id != user.id).exists()
+    ).scalar()
     if conflict:
         raise HTTPException(status_code=400, detail="Email bestaat al")
 
@@ -2994,7 +3542,8 @@ def delete_user(
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
 
-    user = db.query(User).filter(User.id == user_id, User.tenant_id == tenant_id).first()
+    # Enkel id + bootstrap-vlag nodig: geen User-object (en groepen) laden om het meteen te verwijderen.
+    user = db.query(User.id, User.is_bootstrap_admin).filter(User.id == user_id, User.tenant_id == tenant_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Gebruiker niet gevonden")
     if user.id == current_user.id:
@@ -3002,12 +3551,9 @@ def delete_user(
     if user.is_bootstrap_admin:
         raise HTTPException(status_code=400, detail="Bootstrap admin kan niet verwijderd worden")
 
-    user.groups = []
-    with engine.begin() as conn:
-        conn.execute(text("DELETE FROM session_tokens WHERE user_id = :uid AND tenant_id = :tid"), {"uid": user.id, "tid": tenant_id})
-        conn.execute(text("DELETE FROM user_groups WHERE user_id = :uid"), {"uid": user.id})
-
-    db.delete(user)
+    db.execute(text("DELETE FROM session_tokens WHERE user_id = :uid AND tenant_id = :tid"), {"uid": user.id, "tid": tenant_id})
+    db.execute(text("DELETE FROM user_groups WHERE user_id = :uid"), {"uid": user.id})
+    db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
     db.commit()
     return {"ok": True}
 
@@ -3016,8 +3562,14 @@ def delete_user(
 def list_groups(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_dep)):
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
-    groups = db.query(Group).filter(Group.tenant_id == tenant_id).order_by(Group.name.asc()).all()
-    return [group_to_out(g) for g in groups]
+    groups = (
+        db.query(Group)
+        .options(selectinload(Group.users))
+        .filter(Group.tenant_id == tenant_id)
+        .order_by(Group.name.asc())
+        .all()
+    )
+    return JSONResponse([group_to_out(g) for g in groups])
 
 
 @app.post("/api/admin/groups", response_model=GroupOut)
@@ -3029,7 +3581,7 @@ def create_group(
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
 
-    existing = db.query(Group).filter(Group.tenant_id == tenant_id, Group.name == payload.name).first()
+    existing = db.query(db.query(Group.id).filter(Group.tenant_id == tenant_id, Group.name == payload.name).exists()).scalar()
     if existing:
         raise HTTPException(status_code=400, detail="Groepsnaam bestaat al")
 
@@ -3053,15 +3605,16 @@ def delete_group(
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
 
-    group = db.query(Group).filter(Group.id == group_id, Group.tenant_id == tenant_id).first()
+    group = db.query(Group.id, Group.name).filter(Group.id == group_id, Group.tenant_id == tenant_id).first()
     if not group:
         raise HTTPException(status_code=404, detail="Groep niet gevonden")
     if (group.name or "").strip().lower().startswith("administrators"):
         raise HTTPException(status_code=400, detail="Administrators groep kan niet verwijderd worden")
-    if group.users:
+    has_users = db.query(user_groups.c.user_id).filter(user_groups.c.group_id == group.id).first() is not None
+    if has_users:
         raise HTTPException(status_code=400, detail="Groep kan niet verwijderd worden: er zijn nog gebruikers gekoppeld")
 
-    db.delete(group)
+    db.query(Group).filter(Group.id == group.id).delete(synchronize_session=False)
     db.commit()
     return {"ok": True}
 
@@ -3069,7 +3622,11 @@ def delete_group(
 @app.get("/api/admin/integrations", response_model=IntegrationSettingsOut)
 def get_integrations(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_dep)):
     require_admin_access(current_user)
-    return settings_to_out(db, tenant_id=_tenant_id_for_user(current_user))
+    tenant_id = _tenant_id_for_user(current_user)
+    out = settings_to_out(db, tenant_id=tenant_id)
+    # settings_to_out kan legacy JSON-mappings migreren naar bank_category_mappings.
+    _invalidate_bank_category_labels(tenant_id)
+    return out
 
 
 @app.put("/api/admin/integrations", response_model=IntegrationSettingsOut)
@@ -3128,6 +3685,7 @@ def update_integrations(
         bank_csv_mappings=payload.bank_csv_mappings,
         default_ocr_provider=payload.default_ocr_provider,
     )
+    _invalidate_bank_category_labels(tenant_id)
     try:
         fields_set = getattr(payload, "model_fields_set", getattr(payload, "__fields_set__", set()))
         touched = sorted([str(x) for x in fields_set if x])
@@ -3361,11 +3919,13 @@ def delete_bank_account(
 ):
     require_admin_access(current_user)
     tenant_id = _tenant_id_for_user(current_user)
-    row = db.query(BankAccount).filter(BankAccount.id == account_id, BankAccount.tenant_id == tenant_id).first()
-    if not row:
+    row_id = db.query(BankAccount.id).filter(BankAccount.id == account_id, BankAccount.tenant_id == tenant_id).scalar()
+    if not row_id:
         raise HTTPException(status_code=404, detail="Rekening niet gevonden")
-    db.query(BankTransaction).filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == row.id).delete()
-    db.delete(row)
+    db.query(BankTransaction).filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == row_id).delete(
+        synchronize_session=False
+    )
+    db.query(BankAccount).filter(BankAccount.id == row_id).delete(synchronize_session=False)
     db.commit()
     return {"ok": True}
 
@@ -3389,27 +3949,37 @@ def sync_bank_accounts(
         password=str(runtime.get("bank_password") or ""),
     )
     remote_accounts = client.fetch_accounts()
+    externals = {e for r in remote_accounts if (e := str(r.get("external_account_id") or "").strip())}
+    # Bestaande rekeningen in één query ophalen i.p.v. een lookup per remote rekening.
+    existing: dict[str, BankAccount] = {}
+    if externals:
+        for row in (
+            db.query(BankAccount)
+            .filter(BankAccount.tenant_id == tenant_id, BankAccount.external_account_id.in_(externals))
+            .all()
+        ):
+            existing.setdefault(row.external_account_id, row)
     for r in remote_accounts:
         external = str(r.get("external_account_id") or "").strip()
         if not external:
             continue
-        row = db.query(BankAccount).filter(BankAccount.tenant_id == tenant_id, BankAccount.external_account_id == external).first()
+        row = existing.get(external)
         if row:
             row.name = str(r.get("name") or row.name).strip() or row.name
             row.provider = _normalize_bank_provider(r.get("provider") or row.provider)
             row.iban = str(r.get("iban") or row.iban or "").strip() or row.iban
             row.is_active = True
         else:
-            db.add(
-                BankAccount(
-                    tenant_id=tenant_id,
-                    name=str(r.get("name") or external).strip() or external,
-                    provider=_normalize_bank_provider(r.get("provider")),
-                    iban=str(r.get("iban") or "").strip() or None,
-                    external_account_id=external,
-                    is_active=True,
-                )
+            row = BankAccount(
+                tenant_id=tenant_id,
+                name=str(r.get("name") or external).strip() or external,
+                provider=_normalize_bank_provider(r.get("provider")),
+                iban=str(r.get("iban") or "").strip() or None,
+                external_account_id=external,
+                is_active=True,
             )
+            db.add(row)
+            existing[external] = row
     db.commit()
     rows = db.query(BankAccount).filter(BankAccount.tenant_id == tenant_id).order_by(BankAccount.created_at.desc()).all()
     return [bank_account_to_out(r) for r in rows]
@@ -3455,13 +4025,7 @@ def sync_bank_transactions(
     provider = _normalize_bank_provider(account.provider)
     if not _is_xs2a_enabled_for_provider(provider):
         raise HTTPException(status_code=400, detail=f"XS2A voor {provider.upper()} staat uit")
-    client = BankAggregatorClient(
-        provider=provider,
-        base_url=str(runtime.get(f"{provider}_base_url") or runtime.get("bank_base_url") or ""),
-        client_id=str(runtime.get(f"{provider}_client_id") or runtime.get("bank_client_id") or ""),
-        api_key=str(runtime.get(f"{provider}_api_key") or runtime.get("bank_api_key") or ""),
-        password=str(runtime.get(f"{provider}_password") or runtime.get("bank_password") or ""),
-    )
+    client = _bank_client_for_provider(runtime, provider)
     _, raw_external_account_id = _split_external_account_id(account.external_account_id)
 
     txs = client.fetch_transactions(
@@ -3469,44 +4033,7 @@ def sync_bank_transactions(
         date_from=(date_from or "").strip() or None,
         date_to=(date_to or "").strip() or None,
     )
-    for t in txs:
-        ext_id = str(t.get("external_transaction_id") or "").strip()
-        dedupe_hash = _tx_dedupe_hash_from_payload(t)
-        if not ext_id and not dedupe_hash:
-            continue
-        row = _find_existing_bank_tx(
-            db,
-            tenant_id=tenant_id,
-            bank_account_id=account.id,
-            external_transaction_id=ext_id,
-            dedupe_hash=dedupe_hash,
-        )
-        if row:
-            row.external_transaction_id = ext_id or row.external_transaction_id
-            row.booking_date = t.get("booking_date")
-            row.value_date = t.get("value_date")
-            row.amount = t.get("amount")
-            row.currency = t.get("currency")
-            row.counterparty_name = t.get("counterparty_name")
-            row.remittance_information = t.get("remittance_information")
-            row.raw_json = t.get("raw_json")
-            row.dedupe_hash = dedupe_hash
-        else:
-            db.add(
-                BankTransaction(
-                    tenant_id=tenant_id,
-                    bank_account_id=account.id,
-                    external_transaction_id=ext_id or f"dedupe_{dedupe_hash[:16]}",
-                    dedupe_hash=dedupe_hash,
-                    booking_date=t.get("booking_date"),
-                    value_date=t.get("value_date"),
-                    amount=t.get("amount"),
-                    currency=t.get("currency"),
-                    counterparty_name=t.get("counterparty_name"),
-                    remittance_information=t.get("remittance_information"),
-                    raw_json=t.get("raw_json"),
-                )
-            )
+    _upsert_bank_transactions(db, tenant_id=tenant_id, bank_account_id=account.id, txs=txs)
     db.commit()
     rows = (
         db.query(BankTransaction)
@@ -3518,6 +4045,51 @@ def sync_bank_transactions(
     return [bank_transaction_to_out(r) for r in rows]
 
 
+@app.post("/api/bank/sync-transactions")
+def sync_all_bank_transactions(
+    date_from: str | None = Query(default=None),
+    date_to: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_dep),
+):
+    require_admin_access(current_user)
+    tenant_id = _tenant_id_for_user(current_user)
+    accounts = [
+        a
+        for a in db.query(BankAccount).filter(BankAccount.tenant_id == tenant_id, BankAccount.is_active.is_(True)).all()
+        if str(a.provider or "").strip().lower() != "csv"
+        and a.external_account_id != "csv:import"
+        and _is_xs2a_enabled_for_provider(_normalize_bank_provider(a.provider))
+    ]
+    if not accounts:
+        return {"results": []}
+
+    runtime = get_runtime_settings(db, tenant_id=tenant_id)
+    df = (date_from or "").strip() or None
+    dt = (date_to or "").strip() or None
+
+    def _fetch(account: BankAccount) -> list[dict]:
+        client = _bank_client_for_provider(runtime, _normalize_bank_provider(account.provider))
+        _, raw_external_account_id = _split_external_account_id(account.external_account_id)
+        return client.fetch_transactions(raw_external_account_id, date_from=df, date_to=dt)
+
+    # Remote calls zijn I/O-bound: parallel ophalen (begrensd), daarna serieel wegschrijven in deze sessie.
+    with ThreadPoolExecutor(max_workers=min(BANK_SYNC_WORKERS, len(accounts))) as pool:
+        futures = [(a, pool.submit(_fetch, a)) for a in accounts]
+        results = []
+        for account, fut in futures:
+            try:
+                txs = fut.result()
+            except Exception as exc:
+                log.warning("bank transaction sync failed for account %s: %s", account.id, exc)
+                results.append({"account_id": account.id, "synced": 0, "error": str(exc)})
+                continue
+            synced = _upsert_bank_transactions(db, tenant_id=tenant_id, bank_account_id=account.id, txs=txs)
+            results.append({"account_id": account.id, "synced": synced, "error": None})
+    db.commit()
+    return {"results": results}
+
+
 @app.post("/api/bank/accounts/{account_id}/import-transactions", response_model=ImportTransactionsOut)
 async def import_bank_transactions(
     account_id: str,
@@ -3530,53 +4102,10 @@ async def import_bank_transactions(
     account = db.query(BankAccount).filter(BankAccount.id == account_id, BankAccount.tenant_id == tenant_id).first()
     if not account:
         raise HTTPException(status_code=404, detail="Rekening niet gevonden")
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Bestand is leeg")
+    content, _ = await _read_bank_import_upload(file)
 
     _, txs = parse_imported_transactions(file.filename or "", content)
-    imported = 0
-    for t in txs:
-        ext_id = str(t.get("external_transaction_id") or "").strip()
-        dedupe_hash = _tx_dedupe_hash_from_payload(t)
-        if not ext_id and not dedupe_hash:
-            continue
-        row = _find_existing_bank_tx(
-            db,
-            tenant_id=tenant_id,
-            bank_account_id=account.id,
-            external_transaction_id=ext_id,
-            dedupe_hash=dedupe_hash,
-        )
-        if row:
-            row.external_transaction_id = ext_id or row.external_transaction_id
-            row.booking_date = t.get("booking_date")
-            row.value_date = t.get("value_date")
-            row.amount = t.get("amount")
-            row.currency = t.get("currency")
-            row.counterparty_name = t.get("counterparty_name")
-            row.remittance_information = t.get("remittance_information")
-            row.raw_json = t.get("raw_json")
-            row.dedupe_hash = dedupe_hash
-            imported += 1
-        else:
-            db.add(
-                BankTransaction(
-                    tenant_id=tenant_id,
-                    bank_account_id=account.id,
-                    external_transaction_id=ext_id or f"dedupe_{dedupe_hash[:16]}",
-                    dedupe_hash=dedupe_hash,
-                    booking_date=t.get("booking_date"),
-                    value_date=t.get("value_date"),
-                    amount=t.get("amount"),
-                    currency=t.get("currency"),
-                    counterparty_name=t.get("counterparty_name"),
-                    remittance_information=t.get("remittance_information"),
-                    raw_json=t.get("raw_json"),
-                )
-            )
-            imported += 1
-
+    imported = _upsert_bank_transactions(db, tenant_id=tenant_id, bank_account_id=account.id, txs=txs)
     db.commit()
     return {"imported": imported}
 
@@ -3592,13 +4121,9 @@ async def import_bank_csv(
     filename = (file.filename or "").strip().lower()
     if not filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Enkel .csv bestanden zijn toegestaan")
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Bestand is leeg")
+    content, file_sha256 = await _read_bank_import_upload(file)
 
-    file_sha256 = hashlib.sha256(content).hexdigest()
     account = _get_or_create_csv_import_account(db, tenant_id)
-    _, txs = parse_imported_transactions(file.filename or "", content)
 
     # If the exact same file was already imported, ignore this upload completely.
     existing_file = (
@@ -3623,22 +4148,31 @@ async def import_bank_csv(
             db.rollback()
         return {"imported": 0, "duplicate_file": True, "existing_filename": str(existing_file.filename or "")}
 
+    # Pas parsen na de duplicaatcheck: een reeds geïmporteerd bestand hoeft niet opnieuw ontleed te worden.
+    _, txs = parse_imported_transactions(file.filename or "", content)
+
     # First pass: determine which transactions are new (no duplicates).
+    keyed = [(t, str(t.get("external_transaction_id") or "").strip(), _tx_dedupe_hash_from_payload(t)) for t in txs]
+    known_ext, known_hashes = _bank_tx_lookup(
+        db,
+        tenant_id=tenant_id,
+        bank_account_id=account.id,
+        external_transaction_ids={ext_id for _, ext_id, _ in keyed},
+        dedupe_hashes={h for _, _, h in keyed if h},
+    )
+    seen_ext = set(known_ext)
+    seen_hashes = set(known_hashes)
     new_payloads: list[dict] = []
-    for t in txs:
-        ext_id = str(t.get("external_transaction_id") or "").strip()
-        dedupe_hash = _tx_dedupe_hash_from_payload(t)
+    for t, ext_id, dedupe_hash in keyed:
         if not ext_id and not dedupe_hash:
             continue
-        row = _find_existing_bank_tx(
-            db,
-            tenant_id=tenant_id,
-            bank_account_id=account.id,
-            external_transaction_id=ext_id,
-            dedupe_hash=dedupe_hash,
-        )
-        if row:
+        if (ext_id and ext_id in seen_ext) or (dedupe_hash and dedupe_hash in seen_hashes):
             continue
+        # Dubbels binnen hetzelfde bestand ook maar één keer importeren.
+        if ext_id:
+            seen_ext.add(ext_id)
+        if dedupe_hash:
+            seen_hashes.add(dedupe_hash)
         new_payloads.append(t)
 
     if not new_payloads:
@@ -3663,56 +4197,54 @@ async def import_bank_csv(
         imported_count=0,
         file_sha256=file_sha256,
     )
+    # Importrij, transacties en auditregel gaan samen in één commit.
     db.add(import_row)
-    db.commit()
-    db.refresh(import_row)
+    db.flush()
 
-    imported = 0
+    insert_rows: list[dict] = []
     for t in new_payloads:
         ext_id = str(t.get("external_transaction_id") or "").strip()
         dedupe_hash = _tx_dedupe_hash_from_payload(t)
         if not ext_id and not dedupe_hash:
             continue
-        db.add(
-            BankTransaction(
-                tenant_id=tenant_id,
-                bank_account_id=account.id,
-                csv_import_id=import_row.id,
-                external_transaction_id=ext_id or f"dedupe_{dedupe_hash[:16]}",
-                dedupe_hash=dedupe_hash,
-                booking_date=t.get("booking_date"),
-                value_date=t.get("value_date"),
-                amount=t.get("amount"),
-                currency=t.get("currency"),
-                counterparty_name=t.get("counterparty_name"),
-                remittance_information=t.get("remittance_information"),
-                category=None,
-                source=None,
-                auto_mapping=False,
-                llm_mapping=False,
-                manual_mapping=False,
-                raw_json=t.get("raw_json"),
-            )
+        insert_rows.append(
+            {
+                "tenant_id": tenant_id,
+                "bank_account_id": account.id,
+                "csv_import_id": import_row.id,
+                "external_transaction_id": ext_id or f"dedupe_{dedupe_hash[:16]}",
+                "dedupe_hash": dedupe_hash,
+                "booking_date": t.get("booking_date"),
+                "value_date": t.get("value_date"),
+                "amount": t.get("amount"),
+                "currency": t.get("currency"),
+                "counterparty_name": t.get("counterparty_name"),
+                "remittance_information": t.get("remittance_information"),
+                "category": None,
+                "source": None,
+                "auto_mapping": False,
+                "llm_mapping": False,
+                "manual_mapping": False,
+                "raw_json": t.get("raw_json"),
+            }
         )
-        imported += 1
+    if insert_rows:
+        db.execute(insert(BankTransaction), insert_rows)
+    imported = len(insert_rows)
 
     import_row.imported_count = imported
     import_row.parsed_at = datetime.utcnow()
     import_row.parsed_source_hash = "csv-import"
+    audit_log_insert(
+        db,
+        tenant_id=tenant_id,
+        user_id=str(current_user.id),
+        action="bank.csv.upload",
+        entity_type="bank_csv_import",
+        entity_id=str(import_row.id),
+        details={"filename": str(import_row.filename or ""), "imported": imported, "file_sha256": file_sha256},
+    )
     db.commit()
-    try:
-        audit_log(
-            db,
-            tenant_id=tenant_id,
-            user_id=str(current_user.id),
-            action="bank.csv.upload",
-            entity_type="bank_csv_import",
-            entity_id=str(import_row.id),
-            details={"filename": str(import_row.filename or ""), "imported": imported, "file_sha256": file_sha256},
-        )
-        db.commit()
-    except Exception:
-        db.rollback()
     return {"imported": imported}
 
 
@@ -3734,7 +4266,7 @@ def list_bank_csv_transactions(
         .all()
     )
     data = [bank_transaction_to_out(r) for r in rows]
-    return _enrich_budget_transactions_with_doc_links(db, data)
+    return _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, data)
 
 
 @app.post("/api/bank/budget/analyze", response_model=BudgetAnalysisOut)
@@ -3742,26 +4274,34 @@ def analyze_bank_budget(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dep),
 ):
+    return _analyze_bank_budget(db, current_user)
+
+
+def _analyze_bank_budget(
+    db: Session,
+    current_user: User,
+    progress_callback: Callable[[int, int], None] | None = None,
+) -> dict:
     tenant_id = _tenant_id_for_user(current_user)
     progress_user_id = str(current_user.id)
+
+    def _report_progress(*, running: bool, processed: int, total: int, done: bool, error: str | None = None) -> None:
+        # Voortgang voor /progress en, bij een async job, rechtstreeks naar de job (geen polling).
+        _set_budget_progress(progress_user_id, running=running, processed=processed, total=total, done=done, error=error)
+        if progress_callback:
+            progress_callback(processed, total)
+
     account = _get_or_create_csv_import_account(db, tenant_id)
-    rows = (
-        db.query(BankTransaction)
-        .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == account.id)
-        .order_by(BankTransaction.booking_date.asc(), BankTransaction.created_at.asc())
-        .all()
-    )
-    tx_payload = [bank_transaction_to_out(r) for r in rows]
-    tx_payload = _enrich_budget_transactions_with_doc_links(db, tx_payload)
+    tx_payload, csv_import_ids = _load_budget_tx_payload(db, tenant_id, account.id)
+    doc_link_cache: dict = {}
+    tx_payload = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, tx_payload, doc_link_cache=doc_link_cache)
     tx_payload = _attach_budget_document_context(db, tx_payload)
-    _set_budget_progress(
-        progress_user_id,
+    _report_progress(
         running=True,
         processed=0,
         total=len(tx_payload),
         done=False,
     )
-    csv_import_ids = sorted({str(r.csv_import_id) for r in rows if r.csv_import_id})
 
     out_settings = settings_to_out(db, tenant_id=tenant_id)
     runtime = get_runtime_settings(db, tenant_id=tenant_id)
@@ -3778,21 +4318,7 @@ def analyze_bank_budget(
         if provider == "google"
         else str(runtime.get("openrouter_model") or "openai/gpt-4o-mini")
     )
-    tx_hash = _hash_json(
-        [
-            {
-                "external_transaction_id": t.get("external_transaction_id"),
-                "booking_date": t.get("booking_date"),
-                "amount": t.get("amount"),
-                "currency": t.get("currency"),
-                "counterparty_name": t.get("counterparty_name"),
-                "remittance_information": t.get("remittance_information"),
-                "movement_type": _tx_movement_type(t),
-                "linked_document_context": t.get("linked_document_context"),
-            }
-            for t in tx_payload
-        ]
-    )
+    tx_hash = _budget_tx_hash(tx_payload)
     mappings_hash = _hash_json(mappings if isinstance(mappings, list) else [])
     prompt_hash = _hash_json(prompt)
     source_hash = _hash_json(
@@ -3806,14 +4332,7 @@ def analyze_bank_budget(
     )
     cached = db.query(BankBudgetAnalysisRun).filter(BankBudgetAnalysisRun.tenant_id == tenant_id, BankBudgetAnalysisRun.source_hash == source_hash).first()
     if cached:
-        if csv_import_ids:
-            db.query(BankCsvImport).filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(csv_import_ids)).update(
-                {
-                    BankCsvImport.parsed_at: datetime.utcnow(),
-                    BankCsvImport.parsed_source_hash: source_hash,
-                },
-                synchronize_session=False,
-            )
+        if _mark_csv_imports_parsed(db, tenant_id, csv_import_ids, source_hash):
             db.commit()
         cached_rows = (
             db.query(BankBudgetAnalysisTx)
@@ -3835,6 +4354,7 @@ def analyze_bank_budget(
                 cached_summary = []
             cached_failed = any("fallback actief" in str(p or "").lower() for p in cached_summary)
             if not cached_failed:
+                tx_by_ext = _index_by_external_id(tx_payload)
                 merged = _build_budget_analysis_payload(
                     [
                         {
@@ -3844,15 +4364,7 @@ def analyze_bank_budget(
                             "currency": r.currency,
                             "counterparty_name": r.counterparty_name,
                             "remittance_information": r.remittance_information,
-                            **next(
-                                (
-                                    x
-                                    for x in tx_payload
-                                    if str(x.get("external_transaction_id") or "").strip()
-                                    == str(r.external_transaction_id or "").strip()
-                                ),
-                                {},
-                            ),
+                            **tx_by_ext.get(str(r.external_transaction_id or "").strip(), {}),
                         }
                         for r in cached_rows
                     ],
@@ -3872,11 +4384,12 @@ def analyze_bank_budget(
                     mappings if isinstance(mappings, list) else [],
                     preferred_categories=preferred_categories,
                 )
-                merged["transactions"] = _enrich_budget_transactions_with_doc_links(db, merged.get("transactions") or [])
+                merged["transactions"] = _enrich_budget_transactions_with_doc_links_inplace(
+                    db, tenant_id, merged.get("transactions") or [], doc_link_cache=doc_link_cache
+                )
                 _persist_bank_tx_classification(db, tenant_id, merged.get("transactions") or [])
                 _sync_budget_categories_to_mapping_settings(db, tenant_id, merged.get("transactions"))
-                _set_budget_progress(
-                    progress_user_id,
+                _report_progress(
                     running=False,
                     processed=len(tx_payload),
                     total=len(tx_payload),
@@ -3898,9 +4411,10 @@ def analyze_bank_budget(
     llm_data: dict = {}
     llm_failed = False
     unresolved_payload: list[dict] = []
+    mapping_rules = _compile_budget_mappings(mappings if isinstance(mappings, list) else [])
     for tx in tx_payload:
         flow = "income" if float(tx.get("amount") or 0) >= 0 else "expense"
-        if _mapping_category_for_tx(tx, mappings if isinstance(mappings, list) else [], flow):
+        if _mapping_category_for_tx(tx, mapping_rules, flow):
             continue
         unresolved_payload.append(tx)
     try:
@@ -3911,8 +4425,7 @@ def analyze_bank_budget(
                 mappings=mappings if isinstance(mappings, list) else [],
                 runtime=runtime,
                 known_categories=preferred_categories,
-                progress_callback=lambda processed, total: _set_budget_progress(
-                    progress_user_id,
+                progress_callback=lambda processed, total: _report_progress(
                     running=True,
                     processed=min(processed + (len(tx_payload) - len(unresolved_payload)), len(tx_payload)),
                     total=len(tx_payload),
@@ -3923,8 +4436,7 @@ def analyze_bank_budget(
             llm_data = {"summary_points": ["Alle transacties vielen onder expliciete mappings."], "transaction_categories": []}
     except Exception as ex:
         llm_failed = True
-        _set_budget_progress(
-            progress_user_id,
+        _report_progress(
             running=False,
             processed=len(tx_payload),
             total=len(tx_payload),
@@ -3938,8 +4450,9 @@ def analyze_bank_budget(
         llm_data,
         mappings if isinstance(mappings, list) else [],
         preferred_categories=preferred_categories,
+        period_totals=_bank_period_totals(db, tenant_id, account.id),
     )
-    merged["transactions"] = _enrich_budget_transactions_with_doc_links(db, merged.get("transactions") or [])
+    merged["transactions"] = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, merged.get("transactions") or [], doc_link_cache=doc_link_cache)
     _persist_bank_tx_classification(db, tenant_id, merged.get("transactions") or [])
     _sync_budget_categories_to_mapping_settings(db, tenant_id, merged.get("transactions"))
     run = BankBudgetAnalysisRun(
@@ -3955,36 +4468,13 @@ def analyze_bank_budget(
     )
     if not llm_failed:
         db.add(run)
+        db.flush()
+        _insert_budget_analysis_txs(
+            db, tenant_id=tenant_id, run_id=run.id, transactions=merged.get("transactions"), default_source="llm"
+        )
+        _mark_csv_imports_parsed(db, tenant_id, csv_import_ids, source_hash)
         db.commit()
-        db.refresh(run)
-        for item in merged.get("transactions") or []:
-            db.add(
-                BankBudgetAnalysisTx(
-                    tenant_id=tenant_id,
-                    run_id=run.id,
-                    external_transaction_id=str(item.get("external_transaction_id") or ""),
-                    booking_date=item.get("booking_date"),
-                    amount=item.get("amount"),
-                    currency=item.get("currency"),
-                    counterparty_name=item.get("counterparty_name"),
-                    remittance_information=item.get("remittance_information"),
-                    flow=str(item.get("flow") or "expense"),
-                    category=str(item.get("category") or "Ongecategoriseerd"),
-                    source=str(item.get("source") or "llm"),
-                    reason=item.get("reason"),
-                )
-            )
-        if csv_import_ids:
-            db.query(BankCsvImport).filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(csv_import_ids)).update(
-                {
-                    BankCsvImport.parsed_at: datetime.utcnow(),
-                    BankCsvImport.parsed_source_hash: source_hash,
-                },
-                synchronize_session=False,
-            )
-        db.commit()
-    _set_budget_progress(
-        progress_user_id,
+    _report_progress(
         running=False,
         processed=len(tx_payload),
         total=len(tx_payload),
@@ -4026,32 +4516,11 @@ def start_analyze_bank_budget(
     def _worker(progress_cb):
         db = SessionLocal()
         try:
-            # Progress for budget analyze already exists per user; copy to async job too.
+            # Budget-voortgang gaat via de callback ook naar de async job.
             user = db.get(User, current_user.id)
             if not user:
                 raise RuntimeError("Gebruiker niet gevonden")
-            account = _get_or_create_csv_import_account(db, tenant_id)
-            tx_total = (
-                db.query(func.count(BankTransaction.id))
-                .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == account.id)
-                .scalar()
-                or 0
-            )
-            progress_cb(0, int(tx_total))
-            stop_event = Event()
-
-            def _mirror_progress():
-                while not stop_event.wait(0.7):
-                    p = _get_budget_progress(str(current_user.id))
-                    progress_cb(int(p.get("processed") or 0), int(p.get("total") or tx_total))
-
-            mirror = Thread(target=_mirror_progress, daemon=True)
-            mirror.start()
-            result = analyze_bank_budget(db=db, current_user=user)
-            stop_event.set()
-            prog = _get_budget_progress(str(current_user.id))
-            progress_cb(int(prog.get("processed") or 0), int(prog.get("total") or 0))
-            return result
+            return _analyze_bank_budget(db, user, progress_callback=progress_cb)
         finally:
             db.close()
 
@@ -4070,24 +4539,18 @@ def get_latest_bank_budget_analysis(
     current_user: User = Depends(get_current_user_dep),
 ):
     tenant_id = _tenant_id_for_user(current_user)
-    candidate_runs = (
+    # Meest recente run met minstens een transactie, in een query (correlated EXISTS op run_id).
+    latest_run = (
         db.query(BankBudgetAnalysisRun)
-        .filter(BankBudgetAnalysisRun.tenant_id == tenant_id)
-        .order_by(BankBudgetAnalysisRun.created_at.desc())
-        .limit(30)
-        .all()
-    )
-    latest_run = None
-    for run in candidate_runs:
-        has_rows = (
+        .filter(
+            BankBudgetAnalysisRun.tenant_id == tenant_id,
             db.query(BankBudgetAnalysisTx.id)
-            .filter(BankBudgetAnalysisTx.tenant_id == tenant_id, BankBudgetAnalysisTx.run_id == run.id)
-            .first()
-            is not None
+            .filter(BankBudgetAnalysisTx.tenant_id == tenant_id, BankBudgetAnalysisTx.run_id == BankBudgetAnalysisRun.id)
+            .exists(),
         )
-        if has_rows:
-            latest_run = run
-            break
+        .order_by(BankBudgetAnalysisRun.created_at.desc())
+        .first()
+    )
     if not latest_run:
         raise HTTPException(status_code=404, detail="Nog geen budget analyse beschikbaar")
 
@@ -4121,7 +4584,8 @@ def get_latest_bank_budget_analysis(
         }
         for r in tx_rows
     ]
-    transactions = _enrich_budget_transactions_with_doc_links(db, transactions)
+    doc_link_cache: dict = {}
+    transactions = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, transactions, doc_link_cache=doc_link_cache)
     out_settings = settings_to_out(db, tenant_id=tenant_id)
     mappings = out_settings.get("bank_csv_mappings") if isinstance(out_settings, dict) else []
     prompt = str(out_settings.get("bank_csv_prompt") or "").strip() if isinstance(out_settings, dict) else ""
@@ -4145,7 +4609,7 @@ def get_latest_bank_budget_analysis(
         mappings if isinstance(mappings, list) else [],
         preferred_categories=preferred_categories,
     )
-    merged["transactions"] = _enrich_budget_transactions_with_doc_links(db, merged.get("transactions") or [])
+    merged["transactions"] = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, merged.get("transactions") or [], doc_link_cache=doc_link_cache)
     return {
         "provider": latest_run.provider,
         "model": latest_run.model,
@@ -4167,36 +4631,16 @@ def refresh_bank_budget_from_mappings(
 ):
     tenant_id = _tenant_id_for_user(current_user)
     account = _get_or_create_csv_import_account(db, tenant_id)
-    rows = (
-        db.query(BankTransaction)
-        .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.bank_account_id == account.id)
-        .order_by(BankTransaction.booking_date.asc(), BankTransaction.created_at.asc())
-        .all()
-    )
-    tx_payload = [bank_transaction_to_out(r) for r in rows]
-    tx_payload = _enrich_budget_transactions_with_doc_links(db, tx_payload)
+    tx_payload, csv_import_ids = _load_budget_tx_payload(db, tenant_id, account.id)
+    doc_link_cache: dict = {}
+    tx_payload = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, tx_payload, doc_link_cache=doc_link_cache)
     tx_payload = _attach_budget_document_context(db, tx_payload)
-    csv_import_ids = sorted({str(r.csv_import_id) for r in rows if r.csv_import_id})
 
     out_settings = settings_to_out(db, tenant_id=tenant_id)
     mappings = out_settings.get("bank_csv_mappings") if isinstance(out_settings, dict) else []
     preferred_categories = _preferred_budget_categories(mappings if isinstance(mappings, list) else [])
     prompt = str(out_settings.get("bank_csv_prompt") or "").strip() if isinstance(out_settings, dict) else ""
-    tx_hash = _hash_json(
-        [
-            {
-                "external_transaction_id": t.get("external_transaction_id"),
-                "booking_date": t.get("booking_date"),
-                "amount": t.get("amount"),
-                "currency": t.get("currency"),
-                "counterparty_name": t.get("counterparty_name"),
-                "remittance_information": t.get("remittance_information"),
-                "movement_type": _tx_movement_type(t),
-                "linked_document_context": t.get("linked_document_context"),
-            }
-            for t in tx_payload
-        ]
-    )
+    tx_hash = _budget_tx_hash(tx_payload)
     mappings_hash = _hash_json(mappings if isinstance(mappings, list) else [])
     source_hash = _hash_json(
         {
@@ -4208,14 +4652,7 @@ def refresh_bank_budget_from_mappings(
 
     cached = db.query(BankBudgetAnalysisRun).filter(BankBudgetAnalysisRun.tenant_id == tenant_id, BankBudgetAnalysisRun.source_hash == source_hash).first()
     if cached:
-        if csv_import_ids:
-            db.query(BankCsvImport).filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(csv_import_ids)).update(
-                {
-                    BankCsvImport.parsed_at: datetime.utcnow(),
-                    BankCsvImport.parsed_source_hash: source_hash,
-                },
-                synchronize_session=False,
-            )
+        if _mark_csv_imports_parsed(db, tenant_id, csv_import_ids, source_hash):
             db.commit()
         cached_rows = (
             db.query(BankBudgetAnalysisTx)
@@ -4230,6 +4667,7 @@ def refresh_bank_budget_from_mappings(
                 cached_summary = loaded
         except Exception:
             cached_summary = []
+        tx_by_ext = _index_by_external_id(tx_payload)
         merged = _build_budget_analysis_payload(
             [
                 {
@@ -4239,15 +4677,7 @@ def refresh_bank_budget_from_mappings(
                     "currency": r.currency,
                     "counterparty_name": r.counterparty_name,
                     "remittance_information": r.remittance_information,
-                    **next(
-                        (
-                            x
-                            for x in tx_payload
-                            if str(x.get("external_transaction_id") or "").strip()
-                            == str(r.external_transaction_id or "").strip()
-                        ),
-                        {},
-                    ),
+                    **tx_by_ext.get(str(r.external_transaction_id or "").strip(), {}),
                 }
                 for r in cached_rows
             ],
@@ -4267,7 +4697,7 @@ def refresh_bank_budget_from_mappings(
             mappings if isinstance(mappings, list) else [],
             preferred_categories=preferred_categories,
         )
-        merged["transactions"] = _enrich_budget_transactions_with_doc_links(db, merged.get("transactions") or [])
+        merged["transactions"] = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, merged.get("transactions") or [], doc_link_cache=doc_link_cache)
         _persist_bank_tx_classification(db, tenant_id, merged.get("transactions") or [])
         _sync_budget_categories_to_mapping_settings(db, tenant_id, merged.get("transactions"))
         return {
@@ -4283,23 +4713,23 @@ def refresh_bank_budget_from_mappings(
             "month_totals": merged.get("month_totals") or [],
         }
 
-    previous_llm_run = (
-        db.query(BankBudgetAnalysisRun)
+    # Laatste niet-refresh run als scalar subquery: run en tx-rijen in één roundtrip.
+    previous_llm_run_id = (
+        db.query(BankBudgetAnalysisRun.id)
         .filter(
             BankBudgetAnalysisRun.tenant_id == tenant_id,
             BankBudgetAnalysisRun.transactions_hash == tx_hash,
             BankBudgetAnalysisRun.provider != "mapping-refresh",
         )
         .order_by(BankBudgetAnalysisRun.created_at.desc())
-        .first()
+        .limit(1)
+        .scalar_subquery()
+    )
+    previous_tx_rows = (
+        db.query(BankBudgetAnalysisTx)
+        .filter(BankBudgetAnalysisTx.tenant_id == tenant_id, BankBudgetAnalysisTx.run_id == previous_llm_run_id)
+        .all()
     )
-    previous_tx_rows = []
-    if previous_llm_run:
-        previous_tx_rows = (
-            db.query(BankBudgetAnalysisTx)
-            .filter(BankBudgetAnalysisTx.tenant_id == tenant_id, BankBudgetAnalysisTx.run_id == previous_llm_run.id)
-            .all()
-        )
     previous_category_rows = [
         {
             "external_transaction_id": r.external_transaction_id,
@@ -4318,8 +4748,9 @@ def refresh_bank_budget_from_mappings(
         },
         mappings if isinstance(mappings, list) else [],
         preferred_categories=preferred_categories,
+        period_totals=_bank_period_totals(db, tenant_id, account.id),
     )
-    merged["transactions"] = _enrich_budget_transactions_with_doc_links(db, merged.get("transactions") or [])
+    merged["transactions"] = _enrich_budget_transactions_with_doc_links_inplace(db, tenant_id, merged.get("transactions") or [], doc_link_cache=doc_link_cache)
     _persist_bank_tx_classification(db, tenant_id, merged.get("transactions") or [])
     _sync_budget_categories_to_mapping_settings(db, tenant_id, merged.get("transactions"))
     run = BankBudgetAnalysisRun(
@@ -4334,33 +4765,11 @@ def refresh_bank_budget_from_mappings(
         summary_json=json.dumps(merged.get("summary_points") or [], ensure_ascii=False),
     )
     db.add(run)
-    db.commit()
-    db.refresh(run)
-    for item in merged.get("transactions") or []:
-        db.add(
-            BankBudgetAnalysisTx(
-                tenant_id=tenant_id,
-                run_id=run.id,
-                external_transaction_id=str(item.get("external_transaction_id") or ""),
-                booking_date=item.get("booking_date"),
-                amount=item.get("amount"),
-                currency=item.get("currency"),
-                counterparty_name=item.get("counterparty_name"),
-                remittance_information=item.get("remittance_information"),
-                flow=str(item.get("flow") or "expense"),
-                category=str(item.get("category") or "Ongecategoriseerd"),
-                source=str(item.get("source") or "fallback"),
-                reason=item.get("reason"),
-            )
-        )
-    if csv_import_ids:
-        db.query(BankCsvImport).filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(csv_import_ids)).update(
-            {
-                BankCsvImport.parsed_at: datetime.utcnow(),
-                BankCsvImport.parsed_source_hash: source_hash,
-            },
-            synchronize_session=False,
-        )
+    db.flush()
+    _insert_budget_analysis_txs(
+        db, tenant_id=tenant_id, run_id=run.id, transactions=merged.get("transactions"), default_source="fallback"
+    )
+    _mark_csv_imports_parsed(db, tenant_id, csv_import_ids, source_hash)
     db.commit()
     return {
         "provider": "mapping-refresh",
@@ -4383,20 +4792,17 @@ def list_bank_csv_files(
     current_user: User = Depends(get_current_user_dep),
 ):
     tenant_id = _tenant_id_for_user(current_user)
-    parsed_ids = [
-        r[0]
-        for r in db.query(BankTransaction.csv_import_id)
-        .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.csv_import_id.is_not(None))
-        .distinct()
-        .all()
-        if r and r[0]
-    ]
-    if parsed_ids:
-        db.query(BankCsvImport).filter(
-            BankCsvImport.tenant_id == tenant_id,
-            BankCsvImport.id.in_(parsed_ids),
-            BankCsvImport.parsed_at.is_(None),
-        ).update(
+    # Imports zonder parsed_at maar met transacties als geparsed markeren via een correlated EXISTS i.p.v.
+    # eerst alle csv_import_ids op te halen; de probe vermijdt de write wanneer er niets te markeren valt.
+    unparsed_with_txs = (
+        BankCsvImport.tenant_id == tenant_id,
+        BankCsvImport.parsed_at.is_(None),
+        db.query(BankTransaction.id)
+        .filter(BankTransaction.tenant_id == tenant_id, BankTransaction.csv_import_id == BankCsvImport.id)
+        .exists(),
+    )
+    if db.query(db.query(BankCsvImport.id).filter(*unparsed_with_txs).exists()).scalar():
+        db.query(BankCsvImport).filter(*unparsed_with_txs).update(
             {
                 BankCsvImport.parsed_at: datetime.utcnow(),
                 BankCsvImport.parsed_source_hash: "csv-import",
@@ -4408,16 +4814,24 @@ def list_bank_csv_files(
     import_ids = [str(r.id) for r in rows if r and r.id]
     meta_by_import: dict[str, dict[str, str]] = {}
     if import_ids:
-        tx_rows = (
-            db.query(BankTransaction.csv_import_id, BankTransaction.raw_json)
+        # Enkel de oudste transactie per import ophalen (window function) i.p.v. raw_json van alle transacties;
+        # csv_metadata komt uit de preambule van het bestand en is voor elke rij van een import dezelfde.
+        first_tx = (
+            db.query(
+                BankTransaction.csv_import_id,
+                BankTransaction.raw_json,
+                func.row_number()
+                .over(partition_by=BankTransaction.csv_import_id, order_by=BankTransaction.created_at.asc())
+                .label("rn"),
+            )
             .filter(
                 BankTransaction.csv_import_id.in_(import_ids),
                 BankTransaction.tenant_id == tenant_id,
                 BankTransaction.raw_json.is_not(None),
             )
-            .order_by(BankTransaction.created_at.asc())
-            .all()
+            .subquery()
         )
+        tx_rows = db.query(first_tx.c.csv_import_id, first_tx.c.raw_json).filter(first_tx.c.rn == 1).all()
         for csv_import_id, raw_json in tx_rows:
             key = str(csv_import_id or "").strip()
             if not key or key in meta_by_import:
@@ -4466,25 +4880,23 @@ def mark_bank_csv_as_parsed(
 ):
     tenant_id = _tenant_id_for_user(current_user)
     account = _get_or_create_csv_import_account(db, tenant_id)
-    import_ids = [
-        r[0]
-        for r in (
-            db.query(BankTransaction.csv_import_id)
-            .filter(
-                BankTransaction.bank_account_id == account.id,
-                BankTransaction.tenant_id == tenant_id,
-                BankTransaction.csv_import_id.is_not(None),
-            )
-            .distinct()
-            .all()
+    # DISTINCT blijft in de databank: de import-ids worden als subquery in de UPDATE gebruikt.
+    import_ids = (
+        db.query(BankTransaction.csv_import_id)
+        .filter(
+            BankTransaction.bank_account_id == account.id,
+            BankTransaction.tenant_id == tenant_id,
+            BankTransaction.csv_import_id.is_not(None),
         )
-        if r and r[0]
-    ]
-    if not import_ids:
-        return {"updated": 0}
+        .distinct()
+    )
     updated = (
         db.query(BankCsvImport)
-        .filter(BankCsvImport.tenant_id == tenant_id, BankCsvImport.id.in_(import_ids), BankCsvImport.parsed_at.is_(None))
+        .filter(
+            BankCsvImport.tenant_id == tenant_id,
+            BankCsvImport.id.in_(import_ids.scalar_subquery()),
+            BankCsvImport.parsed_at.is_(None),
+        )
         .update(
             {
                 BankCsvImport.parsed_at: datetime.utcnow(),
@@ -4493,6 +4905,9 @@ def mark_bank_csv_as_parsed(
             synchronize_session=False,
         )
     )
+    if not updated:
+        db.rollback()
+        return {"updated": 0}
     db.commit()
     return {"updated": int(updated or 0)}
 
@@ -4548,20 +4963,21 @@ def quick_map_budget_category(
             latest_row.category = category
             latest_row.source = "manual"
             latest_row.reason = "Manueel aangepast door gebruiker"
-    db.commit()
+    # Audit in een savepoint zodat mapping en audit samen in één commit gaan; een mislukte audit laat de mapping intact.
     try:
-        audit_log(
-            db,
-            tenant_id=tenant_id,
-            user_id=str(current_user.id),
-            action="bank.tx.manual_category",
-            entity_type="bank_transaction",
-            entity_id=external_id,
-            details={"category": category},
-        )
-        db.commit()
+        with db.begin_nested():
+            audit_log_insert(
+                db,
+                tenant_id=tenant_id,
+                user_id=str(current_user.id),
+                action="bank.tx.manual_category",
+                entity_type="bank_transaction",
+                entity_id=external_id,
+                details={"category": category},
+            )
     except Exception:
-        db.rollback()
+        pass
+    db.commit()
     return {"ok": True, "external_transaction_id": external_id, "category": category, "source": "manual"}
 
 
@@ -4584,8 +5000,6 @@ async def upload_document(
             db.flush()
         auto_group_id = grp.id
 
-    data = await file.read()
-    content_sha256 = _document_content_sha256(data)
     original_content_type = str(file.content_type or "")
     original_filename = file.filename or "document"
 
@@ -4595,6 +5009,18 @@ async def upload_document(
     original_file_path = Path(settings.uploads_dir) / original_storage_name
     file_path = original_file_path
 
+    # In blokken naar schijf schrijven en tegelijk hashen i.p.v. de volledige upload in geheugen te laden.
+    hasher = hashlib.sha256()
+    try:
+        with original_file_path.open("wb") as fh:
+            while chunk := await file.read(DOCUMENT_UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                fh.write(chunk)
+    except Exception:
+        original_file_path.unlink(missing_ok=True)
+        raise
+    content_sha256 = hasher.hexdigest()
+
     duplicate = (
         db.query(Document)
         .filter(
@@ -4605,7 +5031,6 @@ async def upload_document(
         .order_by(Document.created_at.desc())
         .first()
     )
-    original_file_path.write_bytes(data)
 
     doc = Document(
         id=document_id,
@@ -4630,27 +5055,26 @@ async def upload_document(
         status="uploaded",
     )
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
-
     try:
-        audit_log(
-            db,
-            tenant_id=tenant_id,
-            user_id=str(current_user.id),
-            action="documents.upload",
-            entity_type="document",
-            entity_id=str(doc.id),
-            details={
-                "filename": str(doc.filename or ""),
-                "content_type": str(doc.content_type or ""),
-                "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
-                "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
-            },
-        )
-        db.commit()
+        with db.begin_nested():
+            audit_log_insert(
+                db,
+                tenant_id=tenant_id,
+                user_id=str(current_user.id),
+                action="documents.upload",
+                entity_type="document",
+                entity_id=str(doc.id),
+                details={
+                    "filename": str(doc.filename or ""),
+                    "content_type": str(doc.content_type or ""),
+                    "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
+                    "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
+                },
+            )
     except Exception:
-        db.rollback()
+        pass
+    db.commit()
+    db.refresh(doc)
 
     # For duplicates we first ask user whether to keep as separate version or delete.
     if not duplicate:
@@ -4681,25 +5105,24 @@ async def keep_duplicate_document(
         raise HTTPException(status_code=404, detail="Document niet gevonden")
 
     doc.duplicate_resolved = True
-    db.commit()
-    db.refresh(doc)
-
     try:
-        audit_log(
-            db,
-            tenant_id=tenant_id,
-            user_id=str(current_user.id),
-            action="documents.duplicate.keep",
-            entity_type="document",
-            entity_id=str(doc.id),
-            details={
-                "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
-                "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
-            },
-        )
-        db.commit()
+        with db.begin_nested():
+            audit_log_insert(
+                db,
+                tenant_id=tenant_id,
+                user_id=str(current_user.id),
+                action="documents.duplicate.keep",
+                entity_type="document",
+                entity_id=str(doc.id),
+                details={
+                    "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
+                    "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
+                },
+            )
     except Exception:
-        db.rollback()
+        pass
+    db.commit()
+    db.refresh(doc)
 
     # Start parsing only if it was not processed yet.
     if doc.status == "uploaded" and not bool(getattr(doc, "ocr_processed", False)):
@@ -4732,25 +5155,24 @@ async def delete_duplicate_document(
         raise HTTPException(status_code=404, detail="Document niet gevonden")
 
     doc.deleted_at = datetime.utcnow()
-    db.commit()
-    upsert_search_index(str(doc.id), "")
-
     try:
-        audit_log(
-            db,
-            tenant_id=tenant_id,
-            user_id=str(current_user.id),
-            action="documents.duplicate.delete",
-            entity_type="document",
-            entity_id=str(doc.id),
-            details={
-                "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
-                "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
-            },
-        )
-        db.commit()
+        with db.begin_nested():
+            audit_log_insert(
+                db,
+                tenant_id=tenant_id,
+                user_id=str(current_user.id),
+                action="documents.duplicate.delete",
+                entity_type="document",
+                entity_id=str(doc.id),
+                details={
+                    "duplicate_of_document_id": str(getattr(doc, "duplicate_of_document_id", "") or ""),
+                    "duplicate_reason": str(getattr(doc, "duplicate_reason", "") or ""),
+                },
+            )
     except Exception:
-        db.rollback()
+        pass
+    db.commit()
+    upsert_search_index(str(doc.id), "")
     return {"ok": True}
 
 
@@ -4770,20 +5192,27 @@ def list_documents(
     q = db.query(Document).filter(Document.tenant_id == tenant_id, Document.deleted_at.is_(None))
     if not can_see_all:
         q = q.filter(Document.group_id.in_(group_ids))
-    docs = q.order_by(Document.created_at.desc()).offset(offset).limit(limit).all()
+    # Labels in één batch mee laden: de label-check hieronder en document_to_out lezen d.labels per document.
+    docs = q.options(selectinload(Document.labels)).order_by(Document.created_at.desc()).offset(offset).limit(limit).all()
 
     # Sync bank mapping categories into labels and attach labels on already verified paid documents.
     try:
-        _ensure_bank_category_labels(db, tenant_id)
+        _ensure_bank_category_labels_once(db, tenant_id)
     except Exception:
         db.rollback()
 
+    # Labels per categorie één keer opzoeken voor de backfill en de label-lus hieronder.
+    label_cache: dict = {}
     # Backfill bank category fields from linked transaction when needed (bulk query).
-    ext_ids = [
-        str(d.bank_match_external_transaction_id or "").strip()
-        for d in docs
-        if getattr(d, "bank_paid_verified", False) and (not (getattr(d, "bank_paid_category", None))) and str(getattr(d, "bank_match_external_transaction_id", "") or "").strip()
-    ]
+    # Transactie-id per document één keer normaliseren en hergebruiken in de query en de backfill-lus.
+    pending_backfill = []
+    for d in docs:
+        if not getattr(d, "bank_paid_verified", False) or getattr(d, "bank_paid_category", None):
+            continue
+        eid = (d.bank_match_external_transaction_id or "").strip()
+        if eid:
+            pending_backfill.append((d, eid))
+    ext_ids = [eid for _, eid in pending_backfill]
     if ext_ids:
         tx_rows = (
             db.query(BankTransaction.external_transaction_id, BankTransaction.category, BankTransaction.source)
@@ -4792,44 +5221,42 @@ def list_documents(
         )
         tx_map = {str(eid): {"category": cat, "source": src} for eid, cat, src in tx_rows if eid}
         changed = False
-        for d in docs:
-            if not getattr(d, "bank_paid_verified", False):
-                continue
-            if getattr(d, "bank_paid_category", None):
-                continue
-            eid = str(getattr(d, "bank_match_external_transaction_id", "") or "").strip()
-            if not eid:
-                continue
+        for d, eid in pending_backfill:
             hit = tx_map.get(eid)
             if not hit:
                 continue
-            d.bank_paid_category = str(hit.get("category") or "").strip() or None
-            d.bank_paid_category_source = str(hit.get("source") or "").strip().lower() or None
-            if d.bank_paid_category:
-                _ensure_doc_has_label(db, d, d.bank_paid_category)
+            category = str(hit.get("category") or "").strip()
+            source = str(hit.get("source") or "").strip().lower()
+            d.bank_paid_category = category or None
+            d.bank_paid_category_source = source or None
+            if category:
+                _ensure_doc_has_label(db, d, category, label_cache=label_cache)
                 # If this is an explicit mapping, it may overwrite MAN/AI on documents.
-                if str(d.bank_paid_category_source or "").strip().lower() == "mapping":
-                    d.budget_category = d.bank_paid_category
+                if source == "mapping":
+                    d.budget_category = category
                     d.budget_category_source = "mapping"
             changed = True
         if changed:
+            doc_ids = [d.id for d in docs]
             db.commit()
-            for d in docs:
-                d = db.get(Document, d.id) or d
+            # Eén query ververst alle na de commit verlopen documenten (incl. labels) i.p.v. een SELECT per document.
+            db.query(Document).options(selectinload(Document.labels)).filter(Document.id.in_(doc_ids)).all()
 
     # Ensure label is attached for paid docs even when bank_paid_category was already stored.
+    # Enkel documenten waarvan het label effectief ontbreekt; zonder kandidaten geen verder labelwerk of commit.
     try:
-        changed = False
+        missing_paid_labels = []
         for d in docs:
             if not getattr(d, "bank_paid_verified", False):
                 continue
-            cat = str(getattr(d, "bank_paid_category", "") or "").strip()
+            cat = (d.bank_paid_category or "").strip()
             if not cat:
                 continue
-            if not any(str(l.name or "").strip().lower() == cat.lower() for l in (d.labels or [])):
-                _ensure_doc_has_label(db, d, cat)
-                changed = True
-        if changed:
+            if cat.lower() not in {str(l.name or "").strip().lower() for l in (d.labels or [])}:
+                missing_paid_labels.append((d, cat))
+        if missing_paid_labels:
+            for d, cat in missing_paid_labels:
+                _ensure_doc_has_label(db, d, cat, label_cache=label_cache)
             db.commit()
     except Exception:
         db.rollback()
@@ -4885,7 +5312,8 @@ def _check_documents_against_bank_csv_core(
         if not group_ids:
             return {"checked": 0, "matched": 0, "updated_document_ids": []}
         docs_q = docs_q.filter(Document.group_id.in_(group_ids))
-    docs = docs_q.all()
+    # Labels in één batch laden: _build_searchable_text leest doc.labels voor elk gematcht document.
+    docs = docs_q.options(selectinload(Document.labels)).all()
 
     txs = (
         db.query(BankTransaction)
@@ -4894,16 +5322,31 @@ def _check_documents_against_bank_csv_core(
     )
     runtime = get_runtime_settings(db, tenant_id=tenant_id)
 
+    tx_index = _index_txs_by_cents(txs)
+
+    # Tenant-brede labelsync één keer vóór de lus; labels per categorie opzoeken via label_cache.
+    if docs and txs:
+        try:
+            _ensure_bank_category_labels_once(db, tenant_id)
+        except Exception:
+            db.rollback()
+    label_cache: dict = {}
+
     updated_ids: list[str] = []
     matches: list[dict] = []
     now = datetime.utcnow().strftime("%Y-%m-%d")
     total_docs = len(docs)
+    # Eerste pass: regelgebaseerde score per document; kastickets zonder sterke match verzamelen voor de LLM.
+    scored: list[tuple] = []
+    llm_jobs: dict[int, tuple[dict, list[dict]]] = {}
+    resolved = 0
     for idx, doc in enumerate(docs):
         best_score = -1
         best_confidence = "none"
         best_reason = ""
         best_tx: BankTransaction | None = None
-        for tx in txs:
+        tx_candidates = _prefilter_tx_candidates(doc, tx_index)
+        for tx in tx_candidates:
             score, confidence, reason = _tx_match_score(doc, tx)
             if score > best_score:
                 best_score = score
@@ -4913,8 +5356,9 @@ def _check_documents_against_bank_csv_core(
 
         # For receipts, allow a second-pass LLM pattern check on short candidate list
         # when rule-based score is not yet strong enough.
+        llm_candidates: list[BankTransaction] = []
         if (not best_tx or best_score < 60) and (str(doc.category or "").strip().lower() == "kasticket"):
-            llm_candidates = [tx for tx in txs if _tx_candidate_for_llm(doc, tx)]
+            llm_candidates = [tx for tx in tx_candidates if _tx_candidate_for_llm(doc, tx)]
             if llm_candidates:
                 doc_payload = {
                     "id": doc.id,
@@ -4940,27 +5384,43 @@ def _check_documents_against_bank_csv_core(
                     }
                     for tx in llm_candidates[:8]
                 ]
-                llm_match = match_document_payment_with_llm(
-                    document=doc_payload,
-                    candidates=tx_payload,
-                    runtime=runtime,
-                )
-                if llm_match.get("matched") and llm_match.get("external_transaction_id"):
-                    ext = str(llm_match.get("external_transaction_id") or "").strip()
-                    picked = next((tx for tx in llm_candidates if str(tx.external_transaction_id) == ext), None)
-                    if picked:
-                        best_tx = picked
-                        best_confidence = str(llm_match.get("confidence") or "low")
-                        llm_reason = str(llm_match.get("reason") or "").strip()
-                        best_reason = (
-                            f"LLM patroonherkenning: {llm_reason}" if llm_reason else "LLM patroonherkenning"
-                        )
-                        best_score = 70 if best_confidence == "low" else 85
+                llm_jobs[idx] = (doc_payload, tx_payload)
+        scored.append((doc, best_score, best_confidence, best_reason, best_tx, llm_candidates))
+        # Voortgang = afgehandelde documenten: zonder LLM-fallback is een document na deze pass klaar.
+        if idx not in llm_jobs:
+            resolved += 1
+            if progress_callback:
+                progress_callback(resolved, total_docs)
+
+    # LLM-calls zijn netwerk-bound: parallel uitvoeren (begrensd), daarna serieel toepassen in deze sessie.
+    # Voortgang wordt vanuit deze thread gemeld telkens een call klaar is.
+    llm_matches: dict[int, dict] = {}
+    if llm_jobs:
+        with ThreadPoolExecutor(max_workers=min(BANK_CHECK_LLM_WORKERS, len(llm_jobs))) as pool:
+            futures = {
+                pool.submit(match_document_payment_with_llm, document=doc_payload, candidates=tx_payload, runtime=runtime): idx
+                for idx, (doc_payload, tx_payload) in llm_jobs.items()
+            }
+            for fut in as_completed(futures):
+                llm_matches[futures[fut]] = fut.result()
+                resolved += 1
+                if progress_callback:
+                    progress_callback(resolved, total_docs)
+
+    for idx, (doc, best_score, best_confidence, best_reason, best_tx, llm_candidates) in enumerate(scored):
+        llm_match = llm_matches.get(idx)
+        if llm_match and llm_match.get("matched") and llm_match.get("external_transaction_id"):
+            ext = str(llm_match.get("external_transaction_id") or "").strip()
+            picked = next((tx for tx in llm_candidates if str(tx.external_transaction_id) == ext), None)
+            if picked:
+                best_tx = picked
+                best_confidence = str(llm_match.get("confidence") or "low")
+                llm_reason = str(llm_match.get("reason") or "").strip()
+                best_reason = f"LLM patroonherkenning: {llm_reason}" if llm_reason else "LLM patroonherkenning"
+                best_score = 70 if best_confidence == "low" else 85
 
         # Require a sufficiently confident match to avoid false positives.
         if not best_tx or best_score < 60:
-            if progress_callback:
-                progress_callback(idx + 1, total_docs)
             continue
 
         doc.paid = True
@@ -4970,16 +5430,17 @@ def _check_documents_against_bank_csv_core(
         doc.bank_match_reason = str(best_reason or "")
         doc.bank_match_external_transaction_id = str(best_tx.external_transaction_id or "")
         doc.paid_on = str(best_tx.booking_date or doc.paid_on or now)
-        doc.bank_paid_category = str(best_tx.category or "").strip() or None
-        doc.bank_paid_category_source = str(best_tx.source or "").strip().lower() or None
-        if doc.bank_paid_category:
+        paid_category = (best_tx.category or "").strip()
+        paid_source = (best_tx.source or "").strip().lower()
+        doc.bank_paid_category = paid_category or None
+        doc.bank_paid_category_source = paid_source or None
+        if paid_category:
             # Synchronize mapping categories into labels and attach label to this document.
             try:
-                _ensure_bank_category_labels(db, tenant_id)
-                _ensure_doc_has_label(db, doc, doc.bank_paid_category)
+                _ensure_doc_has_label(db, doc, paid_category, label_cache=label_cache)
                 # Explicit mapping from bank settings may overwrite MAN/AI on documents.
-                if str(doc.bank_paid_category_source or "").strip().lower() == "mapping":
-                    doc.budget_category = doc.bank_paid_category
+                if paid_source == "mapping":
+                    doc.budget_category = paid_category
                     doc.budget_category_source = "mapping"
             except Exception:
                 db.rollback()
@@ -4998,8 +5459,6 @@ def _check_documents_against_bank_csv_core(
                 "reason": str(best_reason or ""),
             }
         )
-        if progress_callback:
-            progress_callback(idx + 1, total_docs)
 
     if updated_ids:
         db.commit()
@@ -5114,10 +5573,13 @@ def soft_delete_documents(
         doc.deleted_at = now
         count += 1
 
+    # Zoekindex opruimen in dezelfde sessie/connectie en transactie als de soft delete.
+    for start in range(0, len(payload.document_ids), PURGE_BATCH_SIZE):
+        db.execute(
+            text("DELETE FROM document_search WHERE document_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": list(payload.document_ids[start : start + PURGE_BATCH_SIZE])},
+        )
     db.commit()
-    with engine.begin() as conn:
-        for doc_id in payload.document_ids:
-            conn.execute(text("DELETE FROM document_search WHERE document_id = :id"), {"id": doc_id})
     if count:
         try:
             audit_log(
@@ -1,5 +1,7 @@
+import json
 import uuid
 from datetime import datetime
+from functools import lru_cache
 
 from sqlalchemy import (
     Boolean,
@@ -12,7 +14,7 @@ from sqlalchemy import (
     Text,
     UniqueConstraint,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from app.db import Base
 
@@ -77,11 +79,22 @@ class Label(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     tenant_id: Mapped[str] = mapped_column(String(36), ForeignKey("tenants.id"), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
+    # lower(trim(name)), kept in sync on write so lookups can use a plain index.
+    normalized_name: Mapped[str | None] = mapped_column(String(120), nullable=True)
     group_id: Mapped[str] = mapped_column(String(36), ForeignKey("groups.id"), nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     documents = relationship("Document", secondary=document_labels, back_populates="labels")
 
+    @validates("name")
+    def _sync_normalized_name(self, _key: str, value: str) -> str:
+        self.normalized_name = normalize_label_name(value)
+        return value
+
+
+def normalize_label_name(value: str | None) -> str:
+    return str(value or "").strip().lower()
+
 
 class CategoryCatalog(Base):
     __tablename__ = "category_catalog"
@@ -89,12 +102,44 @@ class CategoryCatalog(Base):
     tenant_id: Mapped[str] = mapped_column(String(36), ForeignKey("tenants.id"), nullable=False, index=True)
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
+    # lower(trim(name)), kept in sync on write so lookups can use a plain index.
+    normalized_name: Mapped[str | None] = mapped_column(String(120), nullable=True)
     prompt_template: Mapped[str | None] = mapped_column(Text, nullable=True)
     parse_fields_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     parse_config_json: Mapped[str | None] = mapped_column(Text, nullable=True)
     paid_default: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+    @validates("name")
+    def _sync_normalized_name(self, _key: str, value: str) -> str:
+        self.normalized_name = normalize_category_name(value)
+        return value
+
+    def parse_fields_list(self) -> list:
+        return list(decode_json_list(self.parse_fields_json))
+
+    def parse_config_list(self) -> list:
+        return list(decode_json_list(self.parse_config_json))
+
+
+def normalize_category_name(value: str | None) -> str:
+    return str(value or "").strip().lower()
+
+
+def decode_json_list(raw: str | None) -> tuple:
+    # Categorieprofielen worden bij elke documentverwerking/listing opnieuw gelezen; de JSON-tekst
+    # wijzigt zelden, dus decoderen we elke unieke waarde maar één keer. Elementen niet muteren.
+    return _decode_json_list(raw) if raw else ()
+
+
+@lru_cache(maxsize=1024)
+def _decode_json_list(raw: str) -> tuple:
+    try:
+        loaded = json.loads(raw)
+    except Exception:
+        return ()
+    return tuple(loaded) if isinstance(loaded, list) else ()
+
 
 class SessionToken(Base):
     __tablename__ = "session_tokens"
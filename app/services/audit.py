@@ -22,26 +22,61 @@ def _sanitize_details(obj):
     return str(obj)
 
 
-def audit_log(db, *, tenant_id: str, user_id: str | None, action: str, entity_type: str, entity_id: str | None = None, details: dict | None = None, ip: str | None = None, user_agent: str | None = None):
-    # Import inside function to avoid import cycles.
-    from app.models import AuditLog
-
+def _audit_values(*, tenant_id: str, user_id: str | None, action: str, entity_type: str, entity_id: str | None, details: dict | None, ip: str | None, user_agent: str | None) -> dict:
     payload = _sanitize_details(details or {})
     details_json = None
     if payload:
         details_json = json.dumps(payload, ensure_ascii=True, separators=(",", ":"))
+    return {
+        "tenant_id": str(tenant_id),
+        "user_id": str(user_id) if user_id else None,
+        "action": str(action or "").strip()[:80],
+        "entity_type": str(entity_type or "").strip()[:60],
+        "entity_id": str(entity_id)[:255] if entity_id else None,
+        "ip": str(ip)[:64] if ip else None,
+        "user_agent": str(user_agent)[:255] if user_agent else None,
+        "details_json": details_json,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def audit_log(db, *, tenant_id: str, user_id: str | None, action: str, entity_type: str, entity_id: str | None = None, details: dict | None = None, ip: str | None = None, user_agent: str | None = None):
+    # Import inside function to avoid import cycles.
+    from app.models import AuditLog
+
     row = AuditLog(
-        tenant_id=str(tenant_id),
-        user_id=str(user_id) if user_id else None,
-        action=str(action or "").strip()[:80],
-        entity_type=str(entity_type or "").strip()[:60],
-        entity_id=str(entity_id)[:255] if entity_id else None,
-        ip=str(ip)[:64] if ip else None,
-        user_agent=str(user_agent)[:255] if user_agent else None,
-        details_json=details_json,
-        created_at=datetime.utcnow(),
+        **_audit_values(
+            tenant_id=tenant_id,
+            user_id=user_id,
+            action=action,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            details=details,
+            ip=ip,
+            user_agent=user_agent,
+        )
     )
     db.add(row)
     # caller controls commit
     return row
 
+
+def audit_log_insert(db, *, tenant_id: str, user_id: str | None, action: str, entity_type: str, entity_id: str | None = None, details: dict | None = None, ip: str | None = None, user_agent: str | None = None) -> None:
+    # Core INSERT zonder ORM-object (geen identity map/unit-of-work) voor veelgebruikte paden zoals login/logout.
+    from app.models import AuditLog
+
+    db.execute(
+        AuditLog.__table__.insert().values(
+            **_audit_values(
+                tenant_id=tenant_id,
+                user_id=user_id,
+                action=action,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                details=details,
+                ip=ip,
+                user_agent=user_agent,
+            )
+        )
+    )
+    # caller controls commit
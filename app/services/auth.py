@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime, timedelta
 
 from fastapi import Header, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.models import Group, SessionToken, User
 from app.config import settings
@@ -107,7 +107,7 @@ def get_current_user(db: Session, authorization: str | None) -> User:
             except Exception:
                 db.rollback()
             raise HTTPException(status_code=401, detail="Sessie is verlopen")
-    user = db.query(User).filter(User.id == session_token.user_id).first()
+    user = db.query(User).options(selectinload(User.groups)).filter(User.id == session_token.user_id).first()
     if not user:
         raise HTTPException(status_code=401, detail="Gebruiker niet gevonden")
     session_tenant = str(getattr(session_token, "tenant_id", "") or "").strip()
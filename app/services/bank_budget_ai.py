@@ -2,10 +2,14 @@ import json
 import re
 import time
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
 import requests
 
+# Aantal LLM-chunks dat tegelijk in vlucht is; laag gehouden i.v.m. rate limits van de providers.
+LLM_CHUNK_WORKERS = 4
+
 
 def _extract_json(text: str) -> dict[str, Any]:
     value = (text or "").strip()
@@ -253,17 +257,28 @@ Geef ENKEL geldige JSON terug met exact dit schema:
         progress_callback(0, total)
     chunk_size = 80
     failed_chunks = 0
-    for i in range(0, len(compact_transactions), chunk_size):
-        chunk = compact_transactions[i : i + chunk_size]
-        try:
-            data = _call_llm(runtime, _build_chunk_prompt(chunk))
-            chunk_categories = data.get("transaction_categories") if isinstance(data, dict) else []
-            if isinstance(chunk_categories, list):
-                categories_all.extend(chunk_categories)
-        except Exception:
-            failed_chunks += 1
-        if progress_callback:
-            progress_callback(min(i + len(chunk), total), total)
+    chunks = [compact_transactions[i : i + chunk_size] for i in range(0, len(compact_transactions), chunk_size)]
+    # Chunks parallel naar de LLM; resultaten worden in chunkvolgorde samengevoegd en de voortgang wordt
+    # vanuit de aanroepende thread gerapporteerd.
+    chunk_results: list[list[dict[str, Any]] | None] = [None] * len(chunks)
+    processed = 0
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(LLM_CHUNK_WORKERS, len(chunks))) as pool:
+            futures = {pool.submit(_call_llm, runtime, _build_chunk_prompt(chunk)): idx for idx, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    data = future.result()
+                    chunk_categories = data.get("transaction_categories") if isinstance(data, dict) else []
+                    chunk_results[idx] = chunk_categories if isinstance(chunk_categories, list) else []
+                except Exception:
+                    failed_chunks += 1
+                processed += len(chunks[idx])
+                if progress_callback:
+                    progress_callback(min(processed, total), total)
+    for chunk_categories in chunk_results:
+        if chunk_categories:
+            categories_all.extend(chunk_categories)
 
     # Build a small aggregated input for summary generation.
     per_category: dict[str, dict[str, float]] = {}
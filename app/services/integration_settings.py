@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 
 import json
+import time
+from threading import Lock
 
 from app.config import settings
 from app.db import DEFAULT_TENANT_SLUG, get_default_tenant_id
@@ -9,6 +11,12 @@ from app.services.security import decrypt_secret, encrypt_secret
 
 
 BANK_PROVIDERS = {"vdk", "kbc", "bnp"}
+# Runtime settings (incl. ontsleutelde secrets) per tenant kort in het proces cachen.
+RUNTIME_SETTINGS_CACHE_TTL_SECONDS = 30
+RUNTIME_SETTINGS_CACHE_MAX_ENTRIES = 1024
+
+_runtime_settings_cache: dict[str, tuple[float, dict[str, str | None]]] = {}
+_runtime_settings_cache_lock = Lock()
 DEFAULT_BANK_CSV_PROMPT = """Bankverrichtingen
 
 Je bent een financieel analist voor persoonlijke budgetten.
@@ -154,7 +162,36 @@ def get_or_create_settings(db: Session, tenant_id: str | None = None) -> Integra
     return row
 
 
+def invalidate_runtime_settings_cache(tenant_id: str | None = None) -> None:
+    with _runtime_settings_cache_lock:
+        if tenant_id is None:
+            _runtime_settings_cache.clear()
+            return
+        _runtime_settings_cache.pop(str(tenant_id).strip(), None)
+        # Calls zonder expliciete tenant vallen terug op de default tenant.
+        _runtime_settings_cache.pop("", None)
+
+
 def get_runtime_settings(db: Session, tenant_id: str | None = None) -> dict[str, str | None]:
+    key = str(tenant_id or "").strip()
+    now = time.monotonic()
+    with _runtime_settings_cache_lock:
+        cached = _runtime_settings_cache.get(key)
+    if cached and cached[0] > now:
+        return dict(cached[1])
+
+    runtime = _load_runtime_settings(db, tenant_id=tenant_id)
+    with _runtime_settings_cache_lock:
+        if len(_runtime_settings_cache) >= RUNTIME_SETTINGS_CACHE_MAX_ENTRIES:
+            for k in [k for k, (expires, _) in _runtime_settings_cache.items() if expires <= now]:
+                del _runtime_settings_cache[k]
+            if len(_runtime_settings_cache) >= RUNTIME_SETTINGS_CACHE_MAX_ENTRIES:
+                _runtime_settings_cache.clear()
+        _runtime_settings_cache[key] = (now + RUNTIME_SETTINGS_CACHE_TTL_SECONDS, runtime)
+    return dict(runtime)
+
+
+def _load_runtime_settings(db: Session, tenant_id: str | None = None) -> dict[str, str | None]:
     row = get_or_create_settings(db, tenant_id=tenant_id)
 
     aws_secret = decrypt_secret(row.aws_secret_access_key_encrypted) or settings.aws_secret_access_key
@@ -547,4 +584,5 @@ def update_settings(
             row.default_ocr_provider = "llm_vision" if ocr_provider == "openrouter" else ocr_provider
 
     db.commit()
+    invalidate_runtime_settings_cache(resolved_tenant_id)
     return settings_to_out(db, tenant_id=resolved_tenant_id)
@@ -11,7 +11,16 @@ from sqlalchemy import func, text
 
 from app.config import settings
 from app.db import upsert_search_index
-from app.models import BankCategoryMapping, Document, CategoryCatalog, ExtractionHint, Group, Label
+from app.models import (
+    BankCategoryMapping,
+    Document,
+    CategoryCatalog,
+    ExtractionHint,
+    Group,
+    Label,
+    normalize_category_name,
+    normalize_label_name,
+)
 from app.services.ai_extractor import get_ai_extractor
 from app.services.bank_budget_ai import _call_llm
 from app.services.doc_preprocess import ensure_preprocessed_document, original_source_for
@@ -448,29 +457,31 @@ def _ensure_doc_has_label(db: Session, *, doc: Document, label_name: str) -> Non
     if not group_id:
         return
     # Labels are tenant-wide (unique on normalized name). Never key on group_id here.
+    normalized_name = normalize_label_name(name)
     label = (
         db.query(Label)
-        .filter(Label.tenant_id == doc.tenant_id, func.lower(func.trim(Label.name)) == name.strip().lower())
+        .filter(Label.tenant_id == doc.tenant_id, Label.normalized_name == normalized_name)
         .first()
     )
     if not label:
         db.execute(
             text(
                 """
-                INSERT OR IGNORE INTO labels (id, tenant_id, name, group_id, created_at)
-                VALUES (:id, :tenant_id, :name, :group_id, CURRENT_TIMESTAMP)
+                INSERT OR IGNORE INTO labels (id, tenant_id, name, normalized_name, group_id, created_at)
+                VALUES (:id, :tenant_id, :name, :normalized_name, :group_id, CURRENT_TIMESTAMP)
                 """
             ),
             {
                 "id": str(uuid.uuid4()),
                 "tenant_id": str(doc.tenant_id),
                 "name": name,
+                "normalized_name": normalized_name,
                 "group_id": group_id,
             },
         )
         label = (
             db.query(Label)
-            .filter(Label.tenant_id == doc.tenant_id, func.lower(func.trim(Label.name)) == name.strip().lower())
+            .filter(Label.tenant_id == doc.tenant_id, Label.normalized_name == normalized_name)
             .first()
         )
         if not label:
@@ -544,7 +555,7 @@ def _apply_bank_mapping_labels(db: Session, *, doc: Document, ocr_text: str) ->
         _ensure_doc_has_label(db, doc=doc, label_name=matched_category)
         label = (
             db.query(Label)
-            .filter(Label.tenant_id == doc.tenant_id, func.lower(func.trim(Label.name)) == matched_category.strip().lower())
+            .filter(Label.tenant_id == doc.tenant_id, Label.normalized_name == normalize_label_name(matched_category))
             .first()
         )
         if label:
@@ -625,7 +636,7 @@ Regels:
                 group_id = str(getattr(doc, "group_id", "") or "").strip() or _ensure_tenant_default_group_id(db, tenant_id=tenant_id)
                 label = (
                     db.query(Label)
-                    .filter(Label.tenant_id == doc.tenant_id, Label.group_id == group_id, func.lower(Label.name) == cat.lower())
+                    .filter(Label.tenant_id == doc.tenant_id, Label.group_id == group_id, Label.normalized_name == normalize_label_name(cat))
                     .first()
                 )
                 if not label:
@@ -650,7 +661,7 @@ Regels:
         group_id = str(getattr(doc, "group_id", "") or "").strip() or _ensure_tenant_default_group_id(db, tenant_id=tenant_id)
         label = (
             db.query(Label)
-            .filter(Label.tenant_id == doc.tenant_id, Label.group_id == group_id, func.lower(Label.name) == fallback.lower())
+            .filter(Label.tenant_id == doc.tenant_id, Label.group_id == group_id, Label.normalized_name == normalize_label_name(fallback))
             .first()
         )
         if not label:
@@ -772,35 +783,22 @@ def process_document(db: Session, document_id: str, ocr_provider_name: str | Non
         if ai_enabled and not skip_ai_due_to_duplicate:
             categories = db.query(CategoryCatalog).filter(CategoryCatalog.tenant_id == doc.tenant_id).all()
             for c in categories:
-                fields: list[str] = []
                 parse_config: list[dict] = []
-                if c.parse_config_json:
-                    try:
-                        loaded_cfg = json.loads(c.parse_config_json)
-                        if isinstance(loaded_cfg, list):
-                            seen = set()
-                            for item in loaded_cfg:
-                                if not isinstance(item, dict):
-                                    continue
-                                key = str(item.get("key", "")).strip().lower().replace(" ", "_")
-                                if not key or key in seen:
-                                    continue
-                                seen.add(key)
-                                parse_config.append(
-                                    {
-                                        "key": key,
-                                        "visible_in_overview": bool(item.get("visible_in_overview", True)),
-                                    }
-                                )
-                    except Exception:
-                        parse_config = []
-                if c.parse_fields_json:
-                    try:
-                        loaded = json.loads(c.parse_fields_json)
-                        if isinstance(loaded, list):
-                            fields = [str(x) for x in loaded]
-                    except Exception:
-                        fields = []
+                seen = set()
+                for item in c.parse_config_list():
+                    if not isinstance(item, dict):
+                        continue
+                    key = str(item.get("key", "")).strip().lower().replace(" ", "_")
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    parse_config.append(
+                        {
+                            "key": key,
+                            "visible_in_overview": bool(item.get("visible_in_overview", True)),
+                        }
+                    )
+                fields: list[str] = [str(x) for x in c.parse_fields_list()]
                 if not fields and parse_config:
                     fields = [x["key"] for x in parse_config]
                 category_profiles.append(
@@ -903,17 +901,10 @@ def process_document(db: Session, document_id: str, ocr_provider_name: str | Non
             cat = (
                 db.query(CategoryCatalog)
                 .filter(CategoryCatalog.tenant_id == doc.tenant_id)
-                .filter(func.lower(CategoryCatalog.name) == doc.category.lower())
+                .filter(CategoryCatalog.normalized_name == normalize_category_name(doc.category))
                 .first()
             )
-            allowed_fields: set[str] = set()
-            if cat and cat.parse_fields_json:
-                try:
-                    loaded = json.loads(cat.parse_fields_json)
-                    if isinstance(loaded, list):
-                        allowed_fields = {str(x) for x in loaded}
-                except Exception:
-                    allowed_fields = set()
+            allowed_fields: set[str] = {str(x) for x in cat.parse_fields_list()} if cat else set()
 
             if allowed_fields:
                 if "due_date" not in allowed_fields: